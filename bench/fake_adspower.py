@@ -0,0 +1,154 @@
+"""Stand-in for the AdsPower local API that launches local headless Chrome instances.
+
+Serves the endpoints main.py uses: /status, api/v1/user/list, api/v1/browser/start,
+api/v1/browser/stop and api/v1/browser/active. Profiles are numbered 1..N with user_id
+fake<N>. Run on its own with `python bench/fake_adspower.py --profiles 20`.
+"""
+import argparse
+import json
+import os
+import shutil
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+CHROME_NAMES = ['google-chrome', 'google-chrome-stable', 'chromium', 'chromium-browser', 'chrome']
+
+def free_port()->int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+class FakeAdsPower:
+    def __init__(self, profiles:int, chrome:str=None, chromedriver:str=None, start_latency:float=0, headless:bool=True):
+        self.profiles = [{'serial_number': str(i), 'user_id': f'fake{i}'} for i in range(1, profiles + 1)]
+        self.chrome = chrome or os.environ.get('CHROME_BIN') or next(filter(None, map(shutil.which, CHROME_NAMES)), None)
+        self.chromedriver = chromedriver or os.environ.get('CHROMEDRIVER') or shutil.which('chromedriver')
+        self.start_latency = start_latency
+        self.headless = headless
+        self.data_dir = tempfile.mkdtemp(prefix='fake-adspower-')
+        self.browsers = {}  # user_id -> (process, debugger port)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.start_requests = []  # time.time() of each browser/start request
+
+    def user_list(self, query:dict)->dict:
+        if 'serial_number' in query:
+            items = [p for p in self.profiles if p['serial_number'] == query['serial_number']]
+        else:
+            page_size = int(query.get('page_size', 50))
+            page = int(query.get('page', 1))
+            items = self.profiles[(page - 1) * page_size:page * page_size]
+        return {'code': 0, 'msg': 'Success', 'data': {'list': items, 'page': query.get('page', 1)}}
+
+    def start(self, user_id:str)->dict:
+        if self.chrome is None or self.chromedriver is None:
+            return {'code': -1, 'msg': 'chrome or chromedriver not found, set CHROME_BIN and CHROMEDRIVER'}
+        time.sleep(self.start_latency)
+        with self.lock:
+            if user_id in self.browsers and self.browsers[user_id][0].poll() is None:
+                port = self.browsers[user_id][1]
+            else:
+                port = free_port()
+                args = [self.chrome, f'--remote-debugging-port={port}', f'--user-data-dir={os.path.join(self.data_dir, user_id)}',
+                        '--no-first-run', '--no-default-browser-check', '--disable-popup-blocking', 'about:blank']
+                if self.headless:
+                    args.insert(1, '--headless=new')
+                process = subprocess.Popen(args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                self.browsers[user_id] = (process, port)
+
+        # answer once the DevTools endpoint accepts connections, as AdsPower does
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            try:
+                socket.create_connection(('127.0.0.1', port), timeout=1).close()
+                break
+            except OSError:
+                time.sleep(0.1)
+        return {'code': 0, 'msg': 'success', 'data': {
+            'ws': {'selenium': f'127.0.0.1:{port}', 'puppeteer': f'ws://127.0.0.1:{port}/devtools/browser'},
+            'debug_port': str(port),
+            'webdriver': self.chromedriver,
+        }}
+
+    def stop(self, user_id:str)->dict:
+        with self.lock:
+            browser = self.browsers.pop(user_id, None)
+        if browser is None:
+            return {'code': -1, 'msg': 'User_id is not open'}
+        browser[0].terminate()
+        return {'code': 0, 'msg': 'success'}
+
+    def active(self, user_id:str)->dict:
+        with self.lock:
+            browser = self.browsers.get(user_id)
+        status = 'Active' if browser and browser[0].poll() is None else 'Inactive'
+        return {'code': 0, 'msg': 'success', 'data': {'status': status}}
+
+    def handle(self, path:str, query:dict)->dict:
+        with self.lock:
+            self.requests += 1
+        if path == '/status':
+            return {'code': 0, 'msg': 'success'}
+        if path == '/api/v1/user/list':
+            return self.user_list(query)
+        if path == '/api/v1/browser/start':
+            with self.lock:
+                self.start_requests.append(time.time())
+            return self.start(query['user_id'])
+        if path == '/api/v1/browser/stop':
+            return self.stop(query['user_id'])
+        if path == '/api/v1/browser/active':
+            return self.active(query['user_id'])
+        return {'code': -1, 'msg': f'unknown endpoint {path}'}
+
+    def close(self):
+        with self.lock:
+            browsers, self.browsers = self.browsers, {}
+        for process, _ in browsers.values():
+            process.terminate()
+        shutil.rmtree(self.data_dir, ignore_errors=True)
+
+def serve(fake:FakeAdsPower, port:int=0)->ThreadingHTTPServer:
+    """Serve `fake` on 127.0.0.1:`port` from a daemon thread; port 0 picks a free one."""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = {k: v[0] for k, v in parse_qs(url.query).items()}
+            body = json.dumps(fake.handle(url.path, query)).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            try:
+                self.wfile.write(body)
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # the bot was stopped mid-request (startup_bench does this)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--port', type=int, default=50325)
+    parser.add_argument('--profiles', type=int, default=20)
+    parser.add_argument('--start-latency', type=float, default=0)
+    parser.add_argument('--headful', action='store_true')
+    args = parser.parse_args()
+
+    fake = FakeAdsPower(args.profiles, start_latency=args.start_latency, headless=not args.headful)
+    server = serve(fake, args.port)
+    print(f'Fake AdsPower listening on http://127.0.0.1:{server.server_port}/')
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        fake.close()
@@ -0,0 +1,89 @@
+"""Static stand-in for the pioneer site, its deposits API and the OKX wallet popup.
+
+Pages live in bench/mock_site/ and reproduce only the DOM the tasks wait for. Point
+main.py at it with SITE_URL, SITE_API_URL (both the server root) and OKX_POPUP_URL
+(`<root>/mcohilncbfahbmgdjkbpemcciiolgcge/popup.html`); the popup path keeps the
+extension id so the OKX_WALLET_ID window checks still match.
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse
+
+PAGES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'mock_site')
+OKX_WALLET_ID = 'mcohilncbfahbmgdjkbpemcciiolgcge'
+ROUTES = {
+    '/en/point': 'point.html',
+    '/en/universalGas': 'universal_gas.html',
+    '/en/nft': 'nft.html',
+    '/wallet.html': 'wallet.html',
+    f'/{OKX_WALLET_ID}/popup.html': 'popup.html',
+    '/mock.js': 'mock.js',
+}
+CONTENT_TYPES = {'.html': 'text/html; charset=utf-8', '.js': 'application/javascript'}
+
+class MockSite:
+    def __init__(self, latency:float=0.2, response_latency:float=0):
+        self.latency = latency  # seconds before each revealed element appears
+        self.response_latency = response_latency  # seconds added to every HTTP response
+        self.deposits = 0
+        self.lock = threading.Lock()
+
+    def page(self, path:str):
+        name = ROUTES.get(path)
+        if name is None:
+            return None
+        with open(os.path.join(PAGES_DIR, name), encoding='utf-8') as f:
+            body = f.read().replace('{{LATENCY}}', str(int(self.latency * 1000)))
+        return body.encode(), CONTENT_TYPES[os.path.splitext(name)[1]]
+
+    def deposit(self)->bytes:
+        with self.lock:
+            self.deposits += 1
+        return json.dumps({'code': 0, 'data': []}).encode()
+
+def serve(site:MockSite, port:int=0)->ThreadingHTTPServer:
+    """Serve `site` on 127.0.0.1:`port` from a daemon thread; port 0 picks a free one."""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(site.response_latency)
+            path = urlparse(self.path).path
+            if path == '/deposits':
+                page = site.deposit(), 'application/json'
+            else:
+                page = site.page(path)
+            if page is None:
+                self.send_error(404)
+                return
+            body, content_type = page
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('Cache-Control', 'no-store')
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.2)
+    parser.add_argument('--response-latency', type=float, default=0)
+    args = parser.parse_args()
+
+    server = serve(MockSite(args.latency, args.response_latency), args.port)
+    print(f'Mock site listening on http://127.0.0.1:{server.server_port}/')
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,55 @@
+// Shared helpers for the mock pioneer pages. Every element a task waits for appears
+// MOCK_LATENCY milliseconds after the action that reveals it.
+const OKX_WALLET_ID = 'mcohilncbfahbmgdjkbpemcciiolgcge';
+const LATENCY = window.MOCK_LATENCY || 0;
+
+function later(fn) {
+  setTimeout(fn, LATENCY);
+}
+
+function node(html) {
+  const template = document.createElement('template');
+  template.innerHTML = html.trim();
+  return template.content.firstChild;
+}
+
+// Append `html` to `container` after the latency; `onclick` receives the new element.
+function show(container, html, onclick) {
+  later(() => {
+    const element = node(html);
+    if (onclick) element.addEventListener('click', () => onclick(element));
+    container.appendChild(element);
+  });
+}
+
+function clear(container) {
+  container.innerHTML = '';
+}
+
+// Open the wallet confirmation popup the way the OKX extension does. `kind` is "okx" for
+// btn-fill-highlight confirmations or "div" for button>div Confirm; `done` runs once confirmed.
+function openWallet(kind, steps, done) {
+  window.mockWalletDone = done;
+  later(() => window.open(`/${OKX_WALLET_ID}/popup.html?confirm=${kind}&steps=${steps}`, '_blank', 'popup,width=360,height=600'));
+}
+
+// Modal with the Confirm button that starts disabled, as on the check-in and mint flows.
+function confirmModal(onConfirm) {
+  // the click handler sits on the modal; the button is gone once the modal shows the result
+  show(document.body, '<div class="react-responsive-modal-modal"><button data-disabled="true"><div>Confirm</div></button></div>', (modal) => {
+    const button = modal.querySelector('button[data-disabled]');
+    if (button && button.getAttribute('data-disabled') === 'false') onConfirm(modal);
+  });
+  setTimeout(() => {
+    const button = document.querySelector('.react-responsive-modal-modal button');
+    if (button) button.setAttribute('data-disabled', 'false');
+  }, 2 * LATENCY + 50);
+}
+
+function transferSuccessful(modal) {
+  openWallet('div', 1, () => {
+    clear(modal);
+    show(modal, '<div>Transfer Successful!</div>');
+    show(modal, '<button class="react-responsive-modal-closeButton">x</button>', () => modal.remove());
+  });
+}
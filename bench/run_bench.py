@@ -0,0 +1,202 @@
+"""Run main.py end to end against the fake AdsPower API and the mock pioneer site.
+
+Everything the bot reads (.env, profiles.csv, Particle wallets.xlsx) is generated in a
+temporary BOT_HOME, so runs are repeatable and never touch real profiles or wallets.
+Needs a local Chrome and a matching chromedriver (CHROME_BIN / CHROMEDRIVER or on PATH).
+
+    python bench/run_bench.py --profiles 20 --latency 0.2
+
+Prints profiles/hour, per-step p50/p95 durations and WebDriver round trips, and
+optionally writes them as JSON with --output for comparing runs.
+
+With --shards N the run goes through coordinator mode instead: `main.py coordinator`
+serves the profiles and N `main.py worker` processes, each with its own BOT_HOME and
+its own fake AdsPower, run them. The summary is read from the coordinator's reports.
+"""
+import argparse
+import csv
+import glob
+import json
+import os
+import secrets
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+
+from fake_adspower import FakeAdsPower, serve as serve_adspower
+from mock_site import MockSite, OKX_WALLET_ID, serve as serve_site
+
+MAIN_PY = os.path.join(os.path.dirname(BENCH_DIR), 'main.py')
+
+def write_bot_home(home:str, profiles:int, adspower_url:str, site_url:str, tasks:list, workers:int):
+    from openpyxl import Workbook
+
+    settings = {
+        'ADSPOWER_API_URL': adspower_url,
+        'SITE_URL': site_url,
+        'SITE_API_URL': site_url,
+        'OKX_POPUP_URL': f'{site_url}/{OKX_WALLET_ID}/popup.html',
+        'WALLET_PASSWORD': 'bench-password',
+        'TASK_2_AMOUNT_MIN': '0.001',
+        'TASK_2_AMOUNT_MAX': '0.002',
+        'TASK_3_CHAINS': 'Base,Arbitrum',
+        'BALANCE_SETTLE_SECONDS': '0',
+        'WARMUP_SETTLE_SECONDS': '1',
+        'START_WORKERS': str(workers),
+        'MAX_WORKERS': str(workers),
+        'PROGRESS_KEY': f'bench-{int(time.time())}',
+    }
+    for task in range(2, 7):
+        settings[f'SHOULD_RUN_TASK{task}'] = 'yes' if f'task{task}' in tasks else 'no'
+    with open(os.path.join(home, '.env'), mode='w') as file:
+        file.writelines(f'{key}={value}\n' for key, value in settings.items())
+
+    with open(os.path.join(home, 'profiles.csv'), mode='w', newline='') as file:
+        csv.writer(file).writerows([str(i)] for i in range(1, profiles + 1))
+
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(['acc_id', 'wallet'])
+    for i in range(1, profiles + 1):
+        sheet.append([i, f'0x{i:040x}'])
+    workbook.save(os.path.join(home, 'Particle wallets.xlsx'))
+
+def free_port()->int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def add_settings(home:str, settings:dict):
+    with open(os.path.join(home, '.env'), mode='a') as file:
+        file.writelines(f'{key}={value}\n' for key, value in settings.items())
+
+def run_sharded(home:str, shards:int, args, site_url:str)->list:
+    """Run main.py as a coordinator in `home` plus `shards` worker processes; returns the fakes to close."""
+    port = free_port()
+    token = {'COORDINATOR_TOKEN': secrets.token_hex(16)}
+    add_settings(home, token)
+    env = {**os.environ, 'BOT_HOME': home}
+    coordinator = subprocess.Popen([sys.executable, MAIN_PY, 'coordinator', '--port', str(port), '--linger', '3',
+                                    '--workers', str(shards)],
+                                   cwd=home, env=env)
+    fakes, servers, workers = [], [], []
+    try:
+        for shard in range(shards):
+            fake = FakeAdsPower(args.profiles, start_latency=args.start_latency, headless=not args.headful)
+            server = serve_adspower(fake)
+            fakes.append(fake)
+            servers.append(server)
+            worker_home = os.path.join(home, f'worker{shard}')
+            os.mkdir(worker_home)
+            write_bot_home(worker_home, args.profiles, f'http://127.0.0.1:{server.server_port}/', site_url,
+                           [t.strip() for t in args.tasks.split(',')], args.workers)
+            add_settings(worker_home, token)
+            workers.append(subprocess.Popen([sys.executable, MAIN_PY, 'worker', f'http://127.0.0.1:{port}'],
+                                            cwd=worker_home, env={**os.environ, 'BOT_HOME': worker_home}))
+        coordinator.wait()
+        for worker in workers:
+            worker.wait()
+    finally:
+        for process in [coordinator] + workers:
+            if process.poll() is None:
+                process.kill()
+        for server in servers:
+            server.shutdown()
+    return fakes
+
+def percentile(values:list, q:float)->float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+def summarize(home:str, elapsed:float)->dict:
+    reports = os.path.join(home, 'reports')
+    durations = {}
+    for path in glob.glob(os.path.join(reports, 'spans_*.jsonl')):
+        with open(path) as file:
+            for line in file:
+                span = json.loads(line)
+                durations.setdefault(span['span'], []).append(span['duration'])
+
+    results = []
+    for path in glob.glob(os.path.join(reports, 'report_*.csv')):
+        with open(path, newline='') as file:
+            results += [row['Result'] for row in csv.DictReader(file)]
+
+    round_trips = 0
+    for path in glob.glob(os.path.join(reports, 'spans_*.prom')):
+        with open(path) as file:
+            for line in file:
+                if line.startswith('bot_webdriver_round_trips_total '):
+                    round_trips += int(line.split()[1])
+
+    succeeded = sum(1 for r in results if r == 'SUCCESS')
+    return {
+        'elapsed_seconds': round(elapsed, 1),
+        'profiles': len(results),
+        'succeeded': succeeded,
+        'profiles_per_hour': round(succeeded * 3600 / elapsed, 1) if elapsed else 0,
+        'webdriver_round_trips': round_trips,
+        'round_trips_per_profile': round(round_trips / len(results), 1) if results else 0,
+        'steps': {name: {'count': len(values), 'p50': round(percentile(values, 0.5), 3), 'p95': round(percentile(values, 0.95), 3)}
+                  for name, values in sorted(durations.items())},
+    }
+
+def print_summary(summary:dict):
+    print(f"{summary['succeeded']}/{summary['profiles']} profiles succeeded in {summary['elapsed_seconds']}s "
+          f"({summary['profiles_per_hour']} profiles/hour)")
+    print(f"WebDriver round trips: {summary['webdriver_round_trips']} ({summary['round_trips_per_profile']} per profile)")
+    print(f"{'step':40} {'count':>6} {'p50':>8} {'p95':>8}")
+    for name, step in summary['steps'].items():
+        print(f"{name:40} {step['count']:>6} {step['p50']:>8.3f} {step['p95']:>8.3f}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--profiles', type=int, default=10)
+    parser.add_argument('--workers', type=int, default=5, help='worker threads per process')
+    parser.add_argument('--shards', type=int, default=0, help='run N worker processes behind a coordinator')
+    parser.add_argument('--tasks', default='task2,task3,task4,task5,task6', help='comma separated tasks to enable')
+    parser.add_argument('--latency', type=float, default=0.2, help='seconds before each page element appears')
+    parser.add_argument('--response-latency', type=float, default=0, help='seconds added to every mock site response')
+    parser.add_argument('--start-latency', type=float, default=0, help='seconds the fake AdsPower takes per browser start')
+    parser.add_argument('--headful', action='store_true')
+    parser.add_argument('--keep', action='store_true', help='keep the temporary BOT_HOME for inspection')
+    parser.add_argument('--output', help='also write the summary to this JSON file')
+    args = parser.parse_args()
+
+    fake = FakeAdsPower(args.profiles, start_latency=args.start_latency, headless=not args.headful)
+    if fake.chrome is None or fake.chromedriver is None:
+        sys.exit('Chrome and chromedriver are required: set CHROME_BIN and CHROMEDRIVER or put them on PATH')
+    adspower_server = serve_adspower(fake)
+    site_server = serve_site(MockSite(args.latency, args.response_latency))
+
+    home = tempfile.mkdtemp(prefix='bot-bench-')
+    try:
+        write_bot_home(home, args.profiles,
+                       f'http://127.0.0.1:{adspower_server.server_port}/',
+                       f'http://127.0.0.1:{site_server.server_port}',
+                       [t.strip() for t in args.tasks.split(',')], args.workers)
+        started = time.monotonic()
+        if args.shards:
+            for shard_fake in run_sharded(home, args.shards, args, f'http://127.0.0.1:{site_server.server_port}'):
+                shard_fake.close()
+        else:
+            subprocess.run([sys.executable, MAIN_PY], cwd=home, env={**os.environ, 'BOT_HOME': home}, check=False)
+        summary = summarize(home, time.monotonic() - started)
+        print_summary(summary)
+        if args.output:
+            with open(args.output, mode='w') as file:
+                json.dump(summary, file, indent=2)
+    finally:
+        adspower_server.shutdown()
+        site_server.shutdown()
+        fake.close()
+        if args.keep:
+            print(f'BOT_HOME kept at {home}')
+        else:
+            shutil.rmtree(home, ignore_errors=True)
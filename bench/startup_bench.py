@@ -0,0 +1,92 @@
+"""Time from process start to the first AdsPower browser/start request.
+
+Measures `python main.py` and, with --exe, the frozen BOT build (dist/main/BOT.exe after
+build.cmd). Each target gets a fresh BOT_HOME, so its first run is cold (no wallets or
+profiles cache) and later runs are warm. The process is killed as soon as it asks AdsPower
+for a browser; Chrome is not needed. The killed run leaves its job leased, so jobs.db and
+progress.db are removed before every run while the caches stay.
+
+    python bench/startup_bench.py --runs 5 --exe dist/main/BOT.exe
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+
+from fake_adspower import FakeAdsPower, serve as serve_adspower
+from run_bench import MAIN_PY, write_bot_home
+
+RUN_STATE = ('jobs.db', 'progress.db')
+
+def reset_run_state(home:str):
+    for name in RUN_STATE:
+        for suffix in ('', '-wal', '-shm'):
+            try:
+                os.remove(os.path.join(home, name + suffix))
+            except FileNotFoundError:
+                pass
+
+def time_to_first_launch(command:list, home:str, fake:FakeAdsPower, timeout:float)->float:
+    reset_run_state(home)
+    with fake.lock:
+        fake.start_requests.clear()
+    started = time.time()
+    process = subprocess.Popen(command, cwd=home, env={**os.environ, 'BOT_HOME': home},
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.time() - started < timeout:
+            with fake.lock:
+                if fake.start_requests:
+                    return fake.start_requests[0] - started
+            if process.poll() is not None:
+                raise RuntimeError(f'{command[-1]} exited with {process.returncode} before launching a profile')
+            time.sleep(0.005)
+        raise RuntimeError(f'{command[-1]} did not launch a profile within {timeout}s')
+    finally:
+        process.kill()
+        process.wait()
+
+def bench(name:str, command:list, runs:int, fake:FakeAdsPower, adspower_url:str, timeout:float)->dict:
+    home = tempfile.mkdtemp(prefix='bot-startup-')
+    try:
+        write_bot_home(home, 1, adspower_url, 'http://127.0.0.1:9', ['task2'], 1)
+        times = [time_to_first_launch(command, home, fake, timeout) for _ in range(runs)]
+    finally:
+        shutil.rmtree(home, ignore_errors=True)
+    result = {'cold': round(times[0], 3)}
+    if len(times) > 1:
+        result['warm_median'] = round(statistics.median(times[1:]), 3)
+        result['warm_min'] = round(min(times[1:]), 3)
+    print(f'{name:8} ' + '  '.join(f'{key}={value:.3f}s' for key, value in result.items()))
+    return result
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--exe', help='frozen build to measure as well, e.g. dist/main/BOT.exe')
+    parser.add_argument('--timeout', type=float, default=120)
+    parser.add_argument('--output', help='also write the results to this JSON file')
+    args = parser.parse_args()
+
+    fake = FakeAdsPower(1)
+    server = serve_adspower(fake)
+    adspower_url = f'http://127.0.0.1:{server.server_port}/'
+    results = {}
+    try:
+        results['source'] = bench('source', [sys.executable, MAIN_PY], args.runs, fake, adspower_url, args.timeout)
+        if args.exe:
+            results['frozen'] = bench('frozen', [os.path.abspath(args.exe)], args.runs, fake, adspower_url, args.timeout)
+    finally:
+        server.shutdown()
+        fake.close()
+    if args.output:
+        with open(args.output, mode='w') as file:
+            json.dump(results, file, indent=2)
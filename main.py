@@ -10,22 +10,40 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait 
 from selenium.webdriver.support import expected_conditions as EC 
 from selenium.webdriver.common.keys import Keys
-import pyperclip
 import threading
+import queue
+import collections
+import enum
 import random
 import csv
-import pandas as pd
+import json
+import sqlite3
+import socket
+import pickle
+import hashlib
+import hmac
+import re
+import functools
+from types import MappingProxyType
 from datetime import datetime
-from concurrent.futures import ThreadPoolExecutor, as_completed
-import logzero
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse
 from logzero import logger, LogFormatter
 import logging
+from logging.handlers import QueueHandler
 import sys
 from pathlib import Path
-
-API_URL = 'http://local.adspower.net:50325/'
-
-if getattr(sys, 'frozen', False):
+from contextlib import contextmanager
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+if os.environ.get('BOT_HOME'):
+    # lets the benchmark harness run against its own config, profiles and reports
+    current_dir = os.environ['BOT_HOME']
+elif getattr(sys, 'frozen', False):
     current_dir = os.path.dirname('..')    
 else:
     current_dir = os.path.dirname(os.path.abspath(__file__))    
@@ -36,20 +54,627 @@ profiles_csv_path = os.path.join(current_dir, 'profiles.csv')
 logs_dir = os.path.join(current_dir, 'logs')
 extension_path = os.path.join(current_dir, 'captcha-solver-extension')
 reports_dir = os.path.join(current_dir, 'reports')
+warm_profiles_path = os.path.join(current_dir, 'warm_profiles.json')
+profiles_cache_path = os.path.join(current_dir, 'profiles_cache.json')
+wallets_xlsx_path = os.path.join(current_dir, 'Particle wallets.xlsx')
+wallets_cache_path = os.path.join(current_dir, 'wallets.cache')
+progress_db_path = os.path.join(current_dir, 'progress.db')
+jobs_db_path = os.path.join(current_dir, 'jobs.db')
 
 CONFIG = dotenv.dotenv_values(dotenv_path=dotenv_path)
 
+API_URL = CONFIG.get('ADSPOWER_API_URL') or 'http://local.adspower.net:50325/'
+SITE_URL = CONFIG.get('SITE_URL') or 'https://pioneer.particle.network'
+SITE_API_URL = CONFIG.get('SITE_API_URL') or 'https://pioneer-api.particle.network'
+OKX_WALLET_ID = 'mcohilncbfahbmgdjkbpemcciiolgcge'
+OKX_POPUP_URL = CONFIG.get('OKX_POPUP_URL') or f'chrome-extension://{OKX_WALLET_ID}/popup.html'
+# time for a finished transaction to show up in the wallet balance; nothing on the page signals it
+BALANCE_SETTLE_SECONDS = float(CONFIG.get('BALANCE_SETTLE_SECONDS') or 10)
+
+class BufferedFileHandler(logging.FileHandler):
+    """FileHandler that writes through a 64 KiB buffer instead of flushing every record.
+
+    Errors are flushed right away; everything else is flushed by the log writer thread.
+    """
+    def _open(self):
+        return open(self.baseFilename, self.mode, encoding=self.encoding, buffering=1 << 16)
+
+    def emit(self, record:logging.LogRecord):
+        try:
+            self.stream.write(self.format(record) + self.terminator)
+            if record.levelno >= logging.ERROR:
+                self.stream.flush()
+        except Exception:
+            self.handleError(record)
+
+class ProfileQueueHandler(QueueHandler):
+    # Records stay in this process, so the traceback is formatted on the writer thread, not here
+    def prepare(self, record:logging.LogRecord)->logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+class RepeatedExceptionFilter(logging.Filter):
+    """Collapses one logger's repeats of the same exception into the first trace plus a count.
+
+    An exception repeats when its message, type, text and traceback lines equal the previous
+    exception logged by the same logger, even with other records in between. The count is
+    logged when a different exception comes in, with the first record after `window`
+    seconds, or on `flush()`.
+    """
+    def __init__(self, handler:logging.Handler, window:float=60):
+        super().__init__()
+        self.handler = handler
+        self.window = window
+        self.lock = threading.Lock()
+        self.last_key = None
+        self.last_record = None
+        self.first_at = 0
+        self.repeats = 0
+
+    @staticmethod
+    def key(record:logging.LogRecord):
+        if not record.exc_info or record.exc_info[1] is None:
+            return None
+        error = record.exc_info[1]
+        lines = []
+        tb = error.__traceback__
+        while tb is not None:
+            lines.append((tb.tb_frame.f_code.co_filename, tb.tb_lineno))
+            tb = tb.tb_next
+        return (record.msg, type(error), str(error), tuple(lines))
+
+    def filter(self, record:logging.LogRecord)->bool:
+        key = self.key(record)
+        with self.lock:
+            expired = time.monotonic() - self.first_at >= self.window
+            if key is not None and key == self.last_key and not expired:
+                self.repeats += 1
+                return False
+            # other records in between, like a retry's debug line, keep the streak going
+            if key is not None or expired:
+                self.flush_locked()
+            if key is not None:
+                self.last_key, self.last_record, self.first_at = key, record, time.monotonic()
+            return True
+
+    def flush(self):
+        with self.lock:
+            self.flush_locked()
+
+    def flush_locked(self):
+        if self.repeats:
+            message = f'Previous exception repeated {self.repeats} more times'
+            self.handler.emit(logging.makeLogRecord({**self.last_record.__dict__, 'msg': message, 'args': None,
+                                                     'exc_info': None, 'exc_text': None, 'created': time.time()}))
+        self.last_key, self.last_record, self.repeats = None, None, 0
+
+class ProfileLogWriter:
+    """Writes every profile's log file, and their console output, from one thread.
+
+    Profile loggers only put records on a queue, so worker threads never wait on disk. Files
+    are flushed on errors, every `flush_interval` seconds and when the profile's logger is
+    closed at the end of its run. A record that arrives after that, such as from the browser
+    teardown, is appended to the closed file and the file is closed again right away.
+    """
+    def __init__(self, flush_interval:float=2):
+        self.flush_interval = flush_interval
+        self.queue = queue.SimpleQueue()
+        self.formatter = LogFormatter()
+        self.console = logging.StreamHandler()
+        self.console.setFormatter(self.formatter)
+        self.paths = {}  # logger name -> log file
+        self.files = {}  # logger name -> open BufferedFileHandler
+        self.thread = threading.Thread(target=self._run, name='log-writer', daemon=True)
+        self.thread.start()
+
+    def open(self, name:str, path:str)->logging.Logger:
+        profile_logger = logging.getLogger(name)
+        profile_logger.propagate = False
+        profile_logger.setLevel(logging.DEBUG)
+        for handler in list(profile_logger.handlers):
+            profile_logger.removeHandler(handler)
+        handler = ProfileQueueHandler(self.queue)
+        handler.addFilter(RepeatedExceptionFilter(handler))
+        profile_logger.addHandler(handler)
+        self.queue.put(('open', name, path))
+        return profile_logger
+
+    def close(self, profile_logger:logging.Logger):
+        for handler in profile_logger.handlers:
+            for log_filter in handler.filters:
+                if isinstance(log_filter, RepeatedExceptionFilter):
+                    log_filter.flush()
+        self.queue.put(('close', profile_logger.name))
+
+    def stop(self):
+        self.queue.put(None)
+        self.thread.join()
+
+    def file(self, name:str)->BufferedFileHandler:
+        handler = self.files.get(name)
+        if handler is None and name in self.paths:
+            handler = self.files[name] = BufferedFileHandler(self.paths[name], encoding='utf-8')
+            handler.setFormatter(self.formatter)
+        return handler
+
+    def _run(self):
+        last_flush = time.monotonic()
+        closed = set()  # loggers whose run has ended
+        while True:
+            try:
+                item = self.queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                item = False
+            try:
+                if item is None:
+                    break
+                if isinstance(item, tuple):
+                    if item[0] == 'open':
+                        self.paths[item[1]] = item[2]
+                        closed.discard(item[1])
+                    else:
+                        closed.add(item[1])
+                        if item[1] in self.files:
+                            self.files.pop(item[1]).close()
+                elif item:
+                    self.console.handle(item)
+                    handler = self.file(item.name)
+                    if handler is not None:
+                        handler.handle(item)
+                        if item.name in closed:
+                            self.files.pop(item.name).close()
+                if item is False or time.monotonic() - last_flush >= self.flush_interval:
+                    for handler in self.files.values():
+                        handler.flush()
+                    last_flush = time.monotonic()
+            except:
+                logger.exception('Error writing profile logs')
+        for handler in self.files.values():
+            handler.close()
+
+profile_logs = ProfileLogWriter()
+
 def setup_logger(log_file):
     """Set up a logger for a specific run."""
-    formatter = LogFormatter()
-    
-    # Create a new logger object
-    custom_logger = logzero.setup_logger(name=log_file, logfile=log_file, level=logging.DEBUG, formatter=formatter)
-    
-    return custom_logger
+    return profile_logs.open(log_file, log_file)
+
+class TokenBucket:
+    def __init__(self, rate:float, capacity:float=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self)->float:
+        # Reserve a token and sleep until it is due. Returns the time spent waiting.
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            wait_time = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait_time > 0:
+            time.sleep(wait_time)
+        return wait_time
+
+class AdsPowerClient:
+    """Thread-safe client for the AdsPower local API, shared by all workers.
+
+    Requests go through one pooled session and one token bucket sized to AdsPower's
+    request rate. Connection errors and "too many request" answers are retried with
+    jittered exponential backoff.
+    """
+    def __init__(self, base_url:str, rate:float, timeout:float=15, max_retries:int=6, backoff:float=0.5, max_backoff:float=10):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.bucket = TokenBucket(rate)
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=32)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.metrics_lock = threading.Lock()
+        self.counters = {'requests': 0, 'errors': 0, 'throttled': 0, 'queue_delay_total': 0.0, 'queue_delay_max': 0.0}
+
+    def count(self, **values):
+        with self.metrics_lock:
+            for key, value in values.items():
+                if key == 'queue_delay_max':
+                    self.counters[key] = max(self.counters[key], value)
+                else:
+                    self.counters[key] += value
+
+    def metrics(self)->dict:
+        with self.metrics_lock:
+            metrics = dict(self.counters)
+        metrics['queue_delay_avg'] = metrics['queue_delay_total'] / metrics['requests'] if metrics['requests'] else 0
+        return metrics
+
+    def sleep_backoff(self, attempt:int):
+        time.sleep(random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt)))
+
+    def get(self, path:str, params:dict=None, timeout:float=None)->dict:
+        """GET `path` and return the decoded response. Raises requests exceptions once retries run out."""
+        for attempt in range(self.max_retries):
+            waited = self.bucket.acquire()
+            self.count(requests=1, queue_delay_total=waited, queue_delay_max=waited)
+            try:
+                response = self.session.get(f'{self.base_url}{path}', params=params, timeout=timeout or self.timeout).json()
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                self.count(errors=1)
+                if attempt == self.max_retries - 1:
+                    raise
+                self.sleep_backoff(attempt)
+                continue
+
+            if response['code'] != 0 and 'too many request' in response.get('msg', '').lower():
+                self.count(throttled=1)
+                self.sleep_backoff(attempt)
+                continue
+            if response['code'] != 0:
+                self.count(errors=1)
+            return response
+        return response
+
+class ProfileCatalog:
+    """serial_number -> user_id index of AdsPower profiles, persisted to profiles_cache.json.
+
+    Every entry remembers when AdsPower last listed it and is trusted for `ttl` seconds.
+    Only requested ids that are missing or expired are looked up again, and paging
+    stops as soon as all of them have been seen. Profiles AdsPower does not have are kept
+    with a None user_id for the same `ttl`, so a backend without them is not asked again.
+    """
+    PAGE_SIZE = 100
+
+    def __init__(self, path:str, ttl:float, client:AdsPowerClient):
+        self.path = path
+        self.ttl = ttl
+        self.client = client
+        self.index = {}
+        try:
+            with open(path) as file:
+                self.index = json.load(file)
+        except FileNotFoundError:
+            pass
+        except:
+            logger.exception('Error reading profile cache, rebuilding it')
 
-def get_profiles()->list:
+    def save(self):
+        try:
+            with open(self.path, mode='w') as file:
+                json.dump(self.index, file)
+        except:
+            logger.exception('Error saving profile cache')
+
+    def is_fresh(self, serial_number:str)->bool:
+        entry = self.index.get(serial_number)
+        return entry is not None and time.time() - entry['seen_at'] < self.ttl
+
+    def fetch(self, params:dict)->list:
+        resp = self.client.get('api/v1/user/list', params)
+        if resp['code'] != 0:
+            raise RuntimeError(resp['msg'])
+        return resp['data']['list']
+
+    def add(self, items:list, seen_at:float):
+        for i in items:
+            self.index[str(i['serial_number'])] = {'user_id': i['user_id'], 'seen_at': seen_at}
+
+    def resolve(self, serial_numbers:list)->dict:
+        missing = {i for i in serial_numbers if not self.is_fresh(i)}
+        if missing:
+            logger.debug(f'Looking up {len(missing)} profiles in AdsPower')
+            now = time.time()
+            if len(missing) <= 5:
+                for serial_number in missing:
+                    items = self.fetch({'serial_number': serial_number})
+                    if items:
+                        self.add(items, now)
+                    else:
+                        # not on this AdsPower, or deleted from it since it was cached
+                        self.index[serial_number] = {'user_id': None, 'seen_at': now}
+            else:
+                page = 0
+                seen = set()
+                while not missing <= seen:
+                    page += 1
+                    items = self.fetch({'page_size': self.PAGE_SIZE, 'page': page})
+                    if len(items) == 0:
+                        # a complete listing also tells which cached profiles were deleted
+                        for serial_number in (set(self.index) | missing) - seen:
+                            self.index[serial_number] = {'user_id': None, 'seen_at': now}
+                        break
+                    self.add(items, now)
+                    seen.update(str(i['serial_number']) for i in items)
+            self.save()
+        return {i: self.index[i]['user_id'] for i in serial_numbers if self.index.get(i, {}).get('user_id')}
+
+class AdsPowerBackend:
+    """One AdsPower instance of the pool: its API client, profile catalog, cap and metrics.
+
+    `max_browsers` caps the browsers open on it at once (None: no cap). `profile_ranges`,
+    a list of inclusive (first, last) serial numbers, restricts which profiles it may run
+    on top of the ones its own catalog lists.
+    """
+    def __init__(self, url:str, rate:float, cache_path:str, ttl:float, max_browsers:int=None, profile_ranges:list=None):
+        self.url = url
+        self.name = urlparse(url).netloc or url
+        self.client = AdsPowerClient(url, rate=rate)
+        self.catalog = ProfileCatalog(cache_path, ttl, self.client)
+        self.catalog_lock = threading.Lock()
+        self.max_browsers = max_browsers
+        self.profile_ranges = profile_ranges
+        self.healthy = True
+        self.active = 0
+        self.counters = {'starts': 0, 'start_failures': 0, 'start_seconds_total': 0.0, 'health_failures': 0}
+
+    def allows(self, serial_number:str)->bool:
+        if not self.profile_ranges:
+            return True
+        try:
+            serial = int(serial_number)
+        except ValueError:
+            return False
+        return any(first <= serial <= last for first, last in self.profile_ranges)
+
+    def resolve(self, serial_numbers:list)->dict:
+        serial_numbers = [i for i in serial_numbers if self.allows(i)]
+        if not serial_numbers:
+            return {}
+        with self.catalog_lock:
+            return self.catalog.resolve(serial_numbers)
+
+    def has_room(self)->bool:
+        return self.max_browsers is None or self.active < self.max_browsers
+
+    def load(self)->float:
+        return self.active / self.max_browsers if self.max_browsers else self.active
+
+    def check_health(self)->bool:
+        try:
+            healthy = self.client.session.get(f'{self.url}status', timeout=5).json()['code'] == 0
+        except (requests.exceptions.RequestException, ValueError, KeyError):
+            healthy = False
+        if not healthy:
+            self.counters['health_failures'] += 1
+        return healthy
+
+def parse_adspower_endpoints(spec:str)->list:
+    """`url [max=N] [profiles=1-200,305]` entries separated by ';' -> [(url, max_browsers, profile_ranges)].
+
+    Raises ValueError naming the entry that does not parse.
+    """
+    endpoints = []
+    for entry in spec.split(';'):
+        fields = entry.split()
+        if not fields:
+            continue
+        url = fields[0]
+        try:
+            if urlparse(url).scheme not in ('http', 'https') or not urlparse(url).netloc:
+                raise ValueError(f'{url} is not an http(s) URL')
+            options = {}
+            for field in fields[1:]:
+                key, sep, value = field.partition('=')
+                if not sep or key not in ('max', 'profiles'):
+                    raise ValueError(f'unknown option {field}, expected max=N or profiles=1-200,305')
+                options[key] = value
+            ranges = None
+            if options.get('profiles'):
+                ranges = []
+                for part in options['profiles'].split(','):
+                    first, _, last = part.partition('-')
+                    ranges.append((int(first), int(last or first)))
+            max_browsers = int(options['max']) if options.get('max') else None
+        except ValueError as e:
+            raise ValueError(f"ADSPOWER_ENDPOINTS entry '{entry.strip()}': {e}")
+        if not url.endswith('/'):
+            url += '/'
+        endpoints.append((url, max_browsers, ranges))
+    return endpoints
+
+class AdsPowerPool:
+    """The AdsPower backends browsers are started on.
+
+    A profile is placed on the least loaded healthy backend that hosts it and is under its
+    cap; callers wait while every such backend is full. The backend is remembered per
+    user_id until the browser has been torn down, so stop and status calls go to the
+    instance that started it. A background thread checks every backend's /status every
+    `health_interval` seconds; failed starts mark a backend unhealthy until the next check.
+    """
+    def __init__(self, backends:list, health_interval:float=30, place_timeout:float=600):
+        self.backends = backends
+        self.health_interval = health_interval
+        self.place_timeout = place_timeout
+        self.placements = {}  # user_id -> backend
+        self.condition = threading.Condition()
+        self.health_thread = None
+
+    @classmethod
+    def from_config(cls, config)->'AdsPowerPool':
+        rate = float(config.get('ADSPOWER_RATE') or 2)
+        ttl = float(config.get('PROFILE_CACHE_TTL_HOURS') or 24) * 3600
+        try:
+            endpoints = parse_adspower_endpoints(config.get('ADSPOWER_ENDPOINTS') or '')
+        except ValueError as e:
+            logger.error(e)
+            sys.exit(1)
+        if not endpoints:
+            backends = [AdsPowerBackend(API_URL, rate, profiles_cache_path, ttl)]
+        else:
+            backends = []
+            for url, max_browsers, ranges in endpoints:
+                host = re.sub(r'\W+', '_', urlparse(url).netloc)
+                cache_path = os.path.join(current_dir, f'profiles_cache_{host}.json')
+                backends.append(AdsPowerBackend(url, rate, cache_path, ttl, max_browsers, ranges))
+        return cls(backends, health_interval=float(config.get('ADSPOWER_HEALTH_INTERVAL') or 30))
+
+    def start_health_checks(self):
+        with self.condition:
+            if self.health_thread is None and len(self.backends) > 1:
+                self.health_thread = threading.Thread(target=self._check_health, name='adspower-health', daemon=True)
+                self.health_thread.start()
+
+    def _check_health(self):
+        while True:
+            for backend in self.backends:
+                healthy = backend.check_health()
+                with self.condition:
+                    if healthy != backend.healthy:
+                        logger.warning(f'AdsPower {backend.name} is {"healthy again" if healthy else "unhealthy"}')
+                    backend.healthy = healthy
+                    self.condition.notify_all()
+            time.sleep(self.health_interval)
+
+    def resolve(self, serial_numbers:list)->dict:
+        # serial_number -> user_id on the first backend that has the profile
+        user_ids = {}
+        for backend in self.backends:
+            missing = [i for i in serial_numbers if i not in user_ids]
+            if not missing:
+                break
+            try:
+                user_ids.update(backend.resolve(missing))
+            except:
+                logger.exception(f'Error fetching profiles from AdsPower {backend.name}')
+        return user_ids
+
+    def place(self, profile, logger:logging.Logger)->str:
+        """Reserve a slot for `profile` and return its user_id there, or None if no backend can take it."""
+        self.start_health_checks()
+        serial_number = profile['integer_id']
+        hosts = []
+        for backend in self.backends:
+            try:
+                user_id = backend.resolve([serial_number]).get(serial_number)
+            except:
+                logger.exception(f'Error looking up profile on AdsPower {backend.name}')
+                continue
+            if user_id:
+                hosts.append((backend, user_id))
+        if not hosts:
+            logger.error(f'Profile {serial_number} not found on any AdsPower backend')
+            return None
+
+        deadline = time.monotonic() + self.place_timeout
+        waited = False
+        with self.condition:
+            while True:
+                candidates = [(backend.load(), i, backend, user_id) for i, (backend, user_id) in enumerate(hosts)
+                              if backend.healthy and backend.has_room()]
+                if candidates:
+                    _, _, backend, user_id = min(candidates, key=lambda c: c[:2])
+                    backend.active += 1
+                    self.placements[user_id] = backend
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    logger.error(f'No AdsPower backend with room for profile {serial_number}')
+                    return None
+                if not waited:
+                    logger.info('Every AdsPower backend for this profile is full or unhealthy, waiting')
+                    waited = True
+                self.condition.wait(min(remaining, self.health_interval))
+        if len(self.backends) > 1:
+            logger.info(f'Profile {serial_number} placed on AdsPower {backend.name}')
+        profile['alphanumeric_id'] = user_id
+        return user_id
+
+    def backend_for(self, user_id:str)->AdsPowerBackend:
+        with self.condition:
+            return self.placements.get(user_id, self.backends[0])
+
+    def client_for(self, user_id:str)->AdsPowerClient:
+        return self.backend_for(user_id).client
+
+    def start_browser(self, user_id:str)->dict:
+        backend = self.backend_for(user_id)
+        started = time.monotonic()
+        try:
+            # launching a browser can take a while on a cold profile
+            response = backend.client.get('api/v1/browser/start', {'user_id': user_id}, timeout=120)
+        except requests.exceptions.RequestException:
+            with self.condition:
+                backend.counters['start_failures'] += 1
+                backend.healthy = len(self.backends) == 1
+            raise
+        with self.condition:
+            backend.counters['starts'] += 1
+            backend.counters['start_seconds_total'] += time.monotonic() - started
+            if response['code'] != 0:
+                backend.counters['start_failures'] += 1
+        return response
+
+    def release(self, user_id:str):
+        # the browser is closed (or given up on); its slot is free again
+        with self.condition:
+            backend = self.placements.pop(user_id, None)
+            if backend is not None:
+                backend.active -= 1
+                self.condition.notify_all()
+
+    def metrics(self)->dict:
+        # AdsPower API counters summed over every backend
+        totals = {}
+        for backend in self.backends:
+            for key, value in backend.client.metrics().items():
+                if key == 'queue_delay_max':
+                    totals[key] = max(totals.get(key, 0), value)
+                elif key != 'queue_delay_avg':
+                    totals[key] = totals.get(key, 0) + value
+        totals['queue_delay_avg'] = totals['queue_delay_total'] / totals['requests'] if totals['requests'] else 0
+        return totals
+
+    def backend_metrics(self)->dict:
+        with self.condition:
+            return {backend.name: {**backend.client.metrics(), **backend.counters, 'active': backend.active,
+                                   'max_browsers': backend.max_browsers, 'healthy': backend.healthy}
+                    for backend in self.backends}
+
+    def prometheus_lines(self)->list:
+        lines = ['# HELP bot_adspower_starts_total Browser starts per AdsPower backend.',
+                 '# TYPE bot_adspower_starts_total counter']
+        metrics = self.backend_metrics()
+        for name, backend in metrics.items():
+            lines.append(f'bot_adspower_starts_total{{backend="{name}"}} {backend["starts"]}')
+        lines += ['# HELP bot_adspower_start_failures_total Failed browser starts per AdsPower backend.',
+                  '# TYPE bot_adspower_start_failures_total counter']
+        for name, backend in metrics.items():
+            lines.append(f'bot_adspower_start_failures_total{{backend="{name}"}} {backend["start_failures"]}')
+        lines += ['# HELP bot_adspower_start_seconds_total Time spent in browser/start per AdsPower backend.',
+                  '# TYPE bot_adspower_start_seconds_total counter']
+        for name, backend in metrics.items():
+            lines.append(f'bot_adspower_start_seconds_total{{backend="{name}"}} {backend["start_seconds_total"]:.3f}')
+        lines += ['# HELP bot_adspower_requests_total AdsPower API requests per backend.',
+                  '# TYPE bot_adspower_requests_total counter']
+        for name, backend in metrics.items():
+            lines.append(f'bot_adspower_requests_total{{backend="{name}"}} {backend["requests"]}')
+        lines += ['# HELP bot_adspower_healthy Whether the backend passed its last health check.',
+                  '# TYPE bot_adspower_healthy gauge']
+        for name, backend in metrics.items():
+            lines.append(f'bot_adspower_healthy{{backend="{name}"}} {int(backend["healthy"])}')
+        return lines
+
+adspower_pool = AdsPowerPool.from_config(CONFIG)
+
+def resolve_profiles(serial_numbers:list)->list:
     profiles = []
+    user_ids = adspower_pool.resolve(serial_numbers)
+    for i in serial_numbers:
+        if i in user_ids:
+            profiles.append({
+                'integer_id':i,
+                'alphanumeric_id':user_ids[i]
+            })
+        else:
+            logger.error(f'Profile {i} not found in AdsPower')
+    return profiles
+
+def read_profile_ids()->list:
     use_input_profiles = []
     try:            
         with open(profiles_csv_path, mode='r') as file:
@@ -65,69 +690,122 @@ def get_profiles()->list:
                         pass
     except:
         logger.exception('Error reading profiles.csv')
-    
+    return use_input_profiles
+
+def get_profiles()->list:
+    profiles = []
+    use_input_profiles = read_profile_ids()
     try:
         if len(use_input_profiles) > 0:
-            all_available_profiles = []
-            page = 0
-            while True:
-                time.sleep(1)
-                page += 1        
-                resp = requests.get(f'{API_URL}api/v1/user/list?page_size=50&page={page}').json()
-                if resp['code'] != 0:
-                    logger.error(f'Error fetching profiles from api {resp["msg"]}')
-                    return profiles
-                elif len(resp['data']['list']) == 0:
-                    break
-                else:
-                    for i in resp['data']['list']:
-                        all_available_profiles.append({
-                            'integer_id':i['serial_number'],
-                            'alphanumeric_id':i['user_id']
-                        })
-
-            for i in use_input_profiles:
-                for j in all_available_profiles:
-                    if i == j['integer_id']:
-                        profiles.append(j)
-            return profiles       
+            return resolve_profiles(use_input_profiles)
         else:
             return profiles
     except:
         logger.exception('Error fetching profiles from api')
         return profiles
     
-def open_browser_profile(user_id:str, logger:logging.Logger):
+def file_sha256(path:str)->str:
+    digest = hashlib.sha256()
+    with open(path, mode='rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def load_wallets()->MappingProxyType:
+    """acc_id -> wallet address from Particle wallets.xlsx.
+
+    The parsed mapping is pickled to wallets.cache together with the workbook's mtime, size
+    and sha256. An unchanged mtime skips hashing, an unchanged hash skips openpyxl.
+    """
+    stat = os.stat(wallets_xlsx_path)
+    cache = None
     try:
-        while(True):
-            try:
-                response = requests.get(f'{API_URL}api/v1/browser/start?user_id={user_id}').json()
-            except requests.exceptions.ConnectionError:
-                logger.error('AdsPower connection error')
-                return
-
-            if response['code'] != 0:
-                if 'too many request' in response['msg'].lower():
-                    wait_time = random.randint(1, 5)
-                    logger.debug(f'Waiting for {wait_time} seconds to avoid too many api requests')
-                    time.sleep(wait_time)
+        with open(wallets_cache_path, mode='rb') as file:
+            cache = pickle.load(file)
+    except FileNotFoundError:
+        pass
+    except:
+        logger.exception('Error reading wallets cache, rebuilding it')
+
+    if cache and (cache['mtime'], cache['size']) == (stat.st_mtime_ns, stat.st_size):
+        return MappingProxyType(cache['wallets'])
+
+    digest = file_sha256(wallets_xlsx_path)
+    if cache and cache['sha256'] == digest:
+        wallets = cache['wallets']
+    else:
+        # openpyxl directly: pandas and numpy cost seconds of import for one sheet read
+        from openpyxl import load_workbook
+        logger.info('Parsing Particle wallets.xlsx')
+        workbook = load_workbook(wallets_xlsx_path, read_only=True, data_only=True)
+        try:
+            rows = workbook.worksheets[0].iter_rows(values_only=True)
+            header = list(next(rows, ()))
+            acc_id_column, wallet_column = header.index('acc_id'), header.index('wallet')
+            wallets = {}
+            for row in rows:
+                if len(row) <= max(acc_id_column, wallet_column) or row[acc_id_column] in (None, ''):
                     continue
-                logger.error('API error when launching profile')
-                logger.debug(response['msg'])
-                return
-            else:
-                break
+                # first row wins, as the old per-profile lookup did
+                wallets.setdefault(int(float(row[acc_id_column])), row[wallet_column])
+        finally:
+            workbook.close()
+
+    try:
+        with open(wallets_cache_path, mode='wb') as file:
+            pickle.dump({'mtime': stat.st_mtime_ns, 'size': stat.st_size, 'sha256': digest, 'wallets': wallets},
+                        file, protocol=pickle.HIGHEST_PROTOCOL)
+    except:
+        logger.exception('Error saving wallets cache')
+    return MappingProxyType(wallets)
+
+wallets = None
+wallets_lock = threading.Lock()
+
+def get_wallets()->MappingProxyType:
+    # Built once per process and shared read-only by every worker thread
+    global wallets
+    if wallets is None:
+        with wallets_lock:
+            if wallets is None:
+                wallets = load_wallets()
+    return wallets
+
+class CountingChrome(webdriver.Chrome):
+    # Every WebDriver command is one HTTP round trip to chromedriver
+    round_trips = 0
+
+    def execute(self, driver_command:str, params:dict=None):
+        self.round_trips += 1
+        return super().execute(driver_command, params)
+
+def open_browser_profile(user_id:str, logger:logging.Logger, capture_network:bool=False):
+    try:
+        try:
+            response = adspower_pool.start_browser(user_id)
+        except requests.exceptions.RequestException:
+            logger.error('AdsPower connection error')
+            return
+
+        if response['code'] != 0:
+            logger.error('API error when launching profile')
+            logger.debug(response['msg'])
+            return
 
         chrome_driver = response["data"]["webdriver"]
         service = Service(executable_path=chrome_driver)
         chrome_options = Options()
         chrome_options.add_experimental_option("debuggerAddress", response["data"]["ws"]["selenium"])
-        logging_prefs = {'performance': 'ALL'}
-        chrome_options.set_capability('goog:loggingPrefs', logging_prefs)
+        if capture_network:
+            # Network domain only: no Page or timeline events pile up in the session
+            chrome_options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+            chrome_options.add_experimental_option('perfLoggingPrefs', {'enableNetwork': True, 'enablePage': False})
         # chrome_options.add_argument(f'--load-extension={extension_path}')
 
         try:
-            driver = webdriver.Chrome(service=service, options=chrome_options)
+            driver = CountingChrome(service=service, options=chrome_options)
+            if capture_network:
+                driver.network_log = NetworkLog(driver, logger)
             return driver    
         except:
             logger.exception('Exception when connecting to browser')
@@ -136,54 +814,773 @@ def open_browser_profile(user_id:str, logger:logging.Logger):
         logger.exception('Exception when opening browser')
         return
 
-def close_browser_profile(user_id:str, driver:webdriver.Chrome, logger:logging.Logger):
-    logger.debug('Closing browser')
-    try:
-        res = requests.get(f'{API_URL}api/v1/browser/stop?user_id={user_id}').json()
-        logger.debug(f'adspower response {res}')
-        time.sleep(30)
-        res = requests.get(f'{API_URL}api/v1/browser/stop?user_id={user_id}').json()
-        logger.debug(f'adspower response {res}')
-        logger.debug('Browser Closed Successfully')
-    except:
-        logger.exception('Error closing browser')    
+class BrowserTeardown:
+    """Stops AdsPower browsers on a background thread so workers are free for the next profile.
+
+    Each stop request is followed by polling api/v1/browser/active until AdsPower reports the
+    profile inactive. Profiles still active after `deadline` seconds are reported as stragglers.
+    """
+    def __init__(self, deadline:float=90, poll_interval:float=2, restop_interval:float=15):
+        self.deadline = deadline
+        self.poll_interval = poll_interval
+        self.restop_interval = restop_interval
+        self.queue = queue.Queue()
+        self.stragglers = []
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def submit(self, user_id:str, logger:logging.Logger, profile_id:str=None):
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name='browser-teardown', daemon=True)
+                self.thread.start()
+        # run_profile has usually handed in the profile's spans by the time the browser is closed
+        self.queue.put((user_id, logger, profile_id))
+
+    def shutdown(self, timeout:float=None)->list:
+        """Wait for queued teardowns to finish and return the user_ids that did not close in time."""
+        if self.thread is not None:
+            self.queue.put(None)
+            self.thread.join(self.deadline + self.poll_interval if timeout is None else timeout)
+            if self.thread.is_alive():
+                logger.error('Browser teardown did not finish in time')
+        with self.lock:
+            return list(self.stragglers)
+
+    def _stop(self, user_id:str, logger:logging.Logger):
+        try:
+            res = adspower_pool.client_for(user_id).get('api/v1/browser/stop', {'user_id': user_id})
+            logger.debug(f'adspower response {res}')
+        except:
+            logger.exception('Error closing browser')
 
-def wallet_login(driver:webdriver.Chrome, logger:logging.Logger):
-    # Open OKX wallet login page
-    driver.get('chrome-extension://mcohilncbfahbmgdjkbpemcciiolgcge/popup.html')
-    
-    for _ in range(5): # retry stale element
-        time.sleep(1)
+    def _is_active(self, user_id:str, logger:logging.Logger)->bool:
         try:
-            password_field = WebDriverWait(driver, 20).until(
-            EC.element_to_be_clickable((By.CSS_SELECTOR, 'input[type="password"]'))
-            )
-            password_field.click() # shifting focus to input field
-            time.sleep(0.5)
-            password_field.send_keys(CONFIG['WALLET_PASSWORD']) # type password
-            time.sleep(0.5)
-            password_field.send_keys(Keys.RETURN) # press Enter key
-            driver.refresh()
-
-            driver.execute_script("window.open('https://pioneer.particle.network/en/point', '_blank');")
-            time.sleep(5)
-            handles = driver.window_handles
-            break
-        except sException.TimeoutException:
-            logger.debug('Timeout clicking password field')
+            res = adspower_pool.client_for(user_id).get('api/v1/browser/active', {'user_id': user_id})
+            if res['code'] == 0:
+                return res['data']['status'] == 'Active'
+            logger.debug(f'adspower response {res}')
+        except:
+            logger.exception('Error checking browser status')
+        return True
+
+    def _run(self):
+        # user_id -> [logger, profile id, started, last stop request]
+        closing = {}
+        shutting_down = False
+        while closing or not shutting_down:
             try:
-                create_wallet = driver.find_element(By.XPATH, f"//span[text()='Create wallet']")
-                if create_wallet:
-                    logger.error('Wallet is not imported')
-                    return
-            except:
+                item = self.queue.get(timeout=self.poll_interval if closing else None)
+                while True:
+                    if item is None:
+                        shutting_down = True
+                    else:
+                        user_id, profile_logger, profile_id = item
+                        profile_logger.debug('Closing browser')
+                        self._stop(user_id, profile_logger)
+                        now = time.monotonic()
+                        closing[user_id] = [profile_logger, profile_id, now, now]
+                    item = self.queue.get_nowait()
+            except queue.Empty:
+                pass
+
+            for user_id, (profile_logger, profile_id, started, last_stop) in list(closing.items()):
+                now = time.monotonic()
+                if not self._is_active(user_id, profile_logger):
+                    profile_logger.debug(f'Browser Closed Successfully in {now - started:.1f}s')
+                    spans.add(profile_logger, 'close_browser_profile', time.time() - (now - started), now - started, profile_id=profile_id)
+                    adspower_pool.release(user_id)
+                    del closing[user_id]
+                elif now - started > self.deadline:
+                    profile_logger.error(f'Browser still active {self.deadline:.0f}s after stop')
+                    spans.add(profile_logger, 'close_browser_profile', time.time() - (now - started), now - started, outcome='straggler', profile_id=profile_id)
+                    with self.lock:
+                        self.stragglers.append(user_id)
+                    adspower_pool.release(user_id)
+                    del closing[user_id]
+                elif now - last_stop > self.restop_interval:
+                    self._stop(user_id, profile_logger)
+                    closing[user_id][3] = now
+
+browser_teardown = BrowserTeardown()
+
+def close_browser_profile(user_id:str, driver:webdriver.Chrome, logger:logging.Logger, profile_id:str=None):
+    # Hand the browser to the teardown thread; the worker does not wait for AdsPower to close it
+    browser_teardown.submit(user_id, logger, profile_id)
+
+# Adaptive polling bounds for run_step: poll fast while the page is settling, back off when it is slow
+STEP_POLL_MIN = 0.05
+STEP_POLL_MAX = 1.0
+
+# step name -> [total seconds of fixed sleeps removed, times run]
+step_savings = {}
+step_savings_lock = threading.Lock()
+
+def record_step_saving(name:str, saved:float):
+    with step_savings_lock:
+        totals = step_savings.setdefault(name, [0.0, 0])
+        totals[0] += saved
+        totals[1] += 1
+
+def log_step_savings():
+    with step_savings_lock:
+        for name, (saved, runs) in sorted(step_savings.items(), key=lambda i: -i[1][0]):
+            logger.info(f'{name}: {runs} runs, {saved:.1f}s of fixed sleeps saved')
+
+class StepLatency:
+    # Slow and fast moving averages of each step's duration; their ratio shows when the site slows down
+    def __init__(self, slow:float=0.05, fast:float=0.3, min_samples:int=5):
+        self.slow = slow
+        self.fast = fast
+        self.min_samples = min_samples
+        self.steps = {}
+        self.lock = threading.Lock()
+
+    def record(self, name:str, seconds:float):
+        seconds = max(seconds, 0.05)
+        with self.lock:
+            step = self.steps.get(name)
+            if step is None:
+                self.steps[name] = [seconds, seconds, 1]
+            else:
+                step[0] += self.slow * (seconds - step[0])
+                step[1] += self.fast * (seconds - step[1])
+                step[2] += 1
+
+    def inflation(self)->float:
+        with self.lock:
+            ratios = [recent / baseline for baseline, recent, samples in self.steps.values() if samples >= self.min_samples]
+        return sum(ratios) / len(ratios) if ratios else 1.0
+
+step_latency = StepLatency()
+
+class SpanRecorder:
+    """Timing spans for the run: launch, warm-up, every step and task, teardown.
+
+    Each span records its start, duration, attempt count and outcome. Spans are appended to a
+    JSONL file as they end and summarised per step into a Prometheus textfile at the end.
+    Spans logged through a profile's logger are also kept for that profile's report row.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.file = None
+        self.durations = {}  # span name -> [durations]
+        self.outcomes = {}  # (span name, outcome) -> count
+        self.attempts = {}  # span name -> total attempts
+        self.profiles = {}  # logger name -> (profile id, [spans])
+        self.detached = None  # [(profile id, span)] recorded after the profile's row, when forwarded
+        self.round_trips = 0
+
+    def open(self, path:str):
+        self.file = open(path, mode='a', buffering=1)
+
+    def start_profile(self, logger:logging.Logger, profile_id:str):
+        with self.lock:
+            self.profiles[logger.name] = (profile_id, [])
+
+    def add_round_trips(self, count:int):
+        with self.lock:
+            self.round_trips += count
+
+    def pop_profile(self, logger:logging.Logger)->list:
+        with self.lock:
+            return self.profiles.pop(logger.name, (None, []))[1]
+
+    def forward_detached(self):
+        # worker mode: keep spans that miss their profile's report row for pop_detached
+        with self.lock:
+            if self.detached is None:
+                self.detached = []
+
+    def pop_detached(self)->list:
+        with self.lock:
+            detached = self.detached or []
+            if self.detached is not None:
+                self.detached = []
+            return detached
+
+    def add(self, logger:logging.Logger, name:str, start:float, duration:float, attempts:int=1, outcome:str='ok', profile_id:str=None):
+        span = {'span': name, 'start': round(start, 3), 'duration': round(duration, 3), 'attempts': attempts, 'outcome': outcome}
+        with self.lock:
+            registered_id, profile_spans = self.profiles.get(logger.name, (None, None))
+            if profile_spans is not None:
+                profile_id = registered_id
+                profile_spans.append(span)
+            elif self.detached is not None:
+                self.detached.append((profile_id, span))
+            self.durations.setdefault(name, []).append(duration)
+            self.outcomes[(name, outcome)] = self.outcomes.get((name, outcome), 0) + 1
+            self.attempts[name] = self.attempts.get(name, 0) + attempts
+            if self.file is not None:
+                self.file.write(json.dumps({'profile': profile_id, **span}) + '\n')
+
+    def merge(self, profile_id:str, profile_spans:list):
+        # spans a worker process recorded for one profile, reported to the coordinator with its result
+        with self.lock:
+            for span in profile_spans:
+                name, outcome = span['span'], span['outcome']
+                self.durations.setdefault(name, []).append(span['duration'])
+                self.outcomes[(name, outcome)] = self.outcomes.get((name, outcome), 0) + 1
+                self.attempts[name] = self.attempts.get(name, 0) + span['attempts']
+                if self.file is not None:
+                    self.file.write(json.dumps({'profile': profile_id, **span}) + '\n')
+
+    @contextmanager
+    def span(self, logger:logging.Logger, name:str):
+        """Time the block; set ['outcome'] / ['attempts'] on the yielded dict to override the defaults."""
+        fields = {'outcome': 'ok', 'attempts': 1}
+        start, started = time.time(), time.monotonic()
+        try:
+            yield fields
+        except BaseException:
+            if fields['outcome'] == 'ok':
+                fields['outcome'] = 'error'
+            raise
+        finally:
+            self.add(logger, name, start, time.monotonic() - started, fields['attempts'], fields['outcome'])
+
+    def write_prometheus(self, path:str, extra_lines:list=()):
+        def quantile(values, q):
+            return values[min(len(values) - 1, int(q * len(values)))]
+
+        lines = ['# HELP bot_span_duration_seconds Duration of task steps in this run.',
+                 '# TYPE bot_span_duration_seconds summary']
+        with self.lock:
+            for name, durations in sorted(self.durations.items()):
+                durations = sorted(durations)
+                for q in (0.5, 0.95):
+                    lines.append(f'bot_span_duration_seconds{{span="{name}",quantile="{q}"}} {quantile(durations, q):.3f}')
+                lines.append(f'bot_span_duration_seconds_sum{{span="{name}"}} {sum(durations):.3f}')
+                lines.append(f'bot_span_duration_seconds_count{{span="{name}"}} {len(durations)}')
+            lines += ['# HELP bot_span_attempts_total Polls or tries spent in task steps.',
+                      '# TYPE bot_span_attempts_total counter']
+            for name, attempts in sorted(self.attempts.items()):
+                lines.append(f'bot_span_attempts_total{{span="{name}"}} {attempts}')
+            lines += ['# HELP bot_span_outcomes_total Task step outcomes.',
+                      '# TYPE bot_span_outcomes_total counter']
+            for (name, outcome), count in sorted(self.outcomes.items()):
+                lines.append(f'bot_span_outcomes_total{{span="{name}",outcome="{outcome}"}} {count}')
+            lines += ['# HELP bot_webdriver_round_trips_total WebDriver commands sent to chromedriver.',
+                      '# TYPE bot_webdriver_round_trips_total counter',
+                      f'bot_webdriver_round_trips_total {self.round_trips}']
+        lines += extra_lines
+
+        # write then rename so the textfile collector never reads a partial file
+        with open(path + '.tmp', mode='w') as file:
+            file.write('\n'.join(lines) + '\n')
+        os.replace(path + '.tmp', path)
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+spans = SpanRecorder()
+
+def run_step(driver:webdriver.Chrome, logger:logging.Logger, name:str, condition, action=None, timeout:float=20, legacy_sleep:float=0):
+    """Wait until `condition(driver)` is truthy, then return `action(value)` (or the value itself).
+
+    Polling starts at STEP_POLL_MIN and backs off to STEP_POLL_MAX. Stale, missing or
+    covered elements in the condition or the action re-poll the step instead of failing it.
+    `legacy_sleep` is the fixed sleep the old retry loop spent on this step; it is recorded as saved.
+    Raises TimeoutException once `timeout` seconds have passed.
+    """
+    started = time.monotonic()
+    deadline = started + timeout
+    interval = STEP_POLL_MIN
+    polls = 0
+    with spans.span(logger, name) as span:
+        while True:
+            polls += 1
+            span['attempts'] = polls
+            try:
+                value = condition(driver)
+                if value:
+                    result = action(value) if action else value
+                    record_step_saving(name, legacy_sleep)
+                    step_latency.record(name, time.monotonic() - started)
+                    logger.debug(f'{name} done in {time.monotonic() - started:.2f}s after {polls} polls')
+                    return result
+            except (sException.StaleElementReferenceException,
+                    sException.NoSuchElementException,
+                    sException.ElementClickInterceptedException,
+                    sException.ElementNotInteractableException):
                 pass
 
-        except sException.StaleElementReferenceException:
-            logger.debug('StaleElement password field')
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                span['outcome'] = 'timeout'
+                raise sException.TimeoutException(f'{name} not ready after {timeout}s')
+            time.sleep(min(interval, remaining))
+            interval = min(interval * 1.5, STEP_POLL_MAX)
+
+def click(element):
+    element.click()
+
+def scroll_and_click(driver:webdriver.Chrome):
+    def action(element):
+        driver.execute_script("arguments[0].scrollIntoView(true);", element)
+        element.click()
+    return action
+
+# One round trip answers every query of a poll: presence, visibility, enabled state,
+# text and attributes, plus the element itself so the step's action needs no second lookup
+DOM_PROBE_SCRIPT = """
+const [queries, root] = arguments;
+const scope = root || document;
+return queries.map(([kind, selector, withText, attributes]) => {
+    const element = kind === 'xpath'
+        ? document.evaluate(selector, scope, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue
+        : scope.querySelector(selector);
+    if (!element) return null;
+    const style = window.getComputedStyle(element);
+    const result = {
+        element: element,
+        displayed: element.getClientRects().length > 0 && style.visibility !== 'hidden' && style.opacity !== '0',
+        enabled: !element.disabled,
+        attributes: {},
+    };
+    if (withText) result.text = element.innerText;
+    for (const name of attributes) result.attributes[name] = element.getAttribute(name);
+    return result;
+});
+"""
+
+def dom_query(locator:tuple, text:bool=False, attributes:tuple=())->list:
+    by, value = locator
+    if by == By.XPATH:
+        return ['xpath', value, text, list(attributes)]
+    selector = {
+        By.ID: f'[id="{value}"]',
+        By.CLASS_NAME: f'.{value}',
+        By.NAME: f'[name="{value}"]',
+    }.get(by, value)
+    return ['css', selector, text, list(attributes)]
+
+def probe_dom(driver:webdriver.Chrome, queries:list, root=None)->list:
+    """Evaluate `dom_query` queries in one execute_script call; None for each query that matched nothing.
+
+    XPath queries are evaluated relative to `root` when given, CSS queries search inside it.
+    """
+    return driver.execute_script(DOM_PROBE_SCRIPT, queries, root)
+
+def clickable(snapshot):
+    return snapshot['element'] if snapshot and snapshot['displayed'] and snapshot['enabled'] else False
+
+def probe_clickable(locator:tuple, root=None):
+    # element_to_be_clickable in one round trip instead of find_element + is_displayed + is_enabled
+    query = [dom_query(locator)]
+    return lambda driver: clickable(probe_dom(driver, query, root)[0])
+
+def probe_present(locator:tuple):
+    query = [dom_query(locator)]
+    def condition(driver):
+        snapshot = probe_dom(driver, query)[0]
+        return snapshot['element'] if snapshot else False
+    return condition
+
+def probe_text(locator:tuple, predicate):
+    # `predicate(text)` on the element's rendered text, as WebElement.text returns it
+    query = [dom_query(locator, text=True)]
+    def condition(driver):
+        snapshot = probe_dom(driver, query)[0]
+        return bool(snapshot) and predicate(snapshot['text'])
+    return condition
+
+def clickable_replacement(old_element, locator, grace:float):
+    # Condition for a confirm button that replaces one we just clicked. Pages that
+    # re-render in place keep the same node, so fall back to it after `grace` seconds.
+    since = time.monotonic()
+    query = [dom_query(locator)]
+    def condition(driver):
+        if not EC.staleness_of(old_element)(driver) and time.monotonic() - since < grace:
+            return False
+        return clickable(probe_dom(driver, query)[0])
+    return condition
+
+def in_scroll_container(locator):
+    # Wallet list items are only usable once the list's scrollContainer has rendered
+    queries = [dom_query((By.CLASS_NAME, 'scrollContainer')), dom_query(locator)]
+    def condition(driver):
+        container, item = probe_dom(driver, queries)
+        return clickable(item) if container else False
+    return condition
+
+class WindowRegistry:
+    """URL of every window of one browser session, learnt once per window.
+
+    Each refresh costs one window_handles call. URLs of windows not seen before come from
+    a single CDP Target.getTargets call, whose target ids are the WebDriver window handles.
+    Without CDP only the new windows are switched into, and focus is put back afterwards.
+    Windows still on about:blank are looked at again, since popups navigate after opening.
+    """
+    def __init__(self, driver:webdriver.Chrome):
+        self.driver = driver
+        self.urls = {}  # window handle -> url
+        self.use_cdp = True
+
+    def target_urls(self)->dict:
+        targets = self.driver.execute_cdp_cmd('Target.getTargets', {})['targetInfos']
+        return {target['targetId']: target['url'] for target in targets}
+
+    def refresh(self)->dict:
+        handles = self.driver.window_handles
+        self.urls = {handle: url for handle, url in self.urls.items() if handle in handles}
+        new = [handle for handle in handles if self.urls.get(handle, 'about:blank') in ('', 'about:blank')]
+        if new and self.use_cdp:
+            try:
+                targets = self.target_urls()
+                for handle in new:
+                    # older chromedriver versions prefix the target id
+                    url = targets.get(handle.replace('CDwindow-', ''))
+                    if url is not None:
+                        self.urls[handle] = url
+                new = [handle for handle in new if handle not in self.urls]
+            except sException.WebDriverException:
+                self.use_cdp = False
+        if new:
+            focused = self.driver.current_window_handle
+            try:
+                for handle in new:
+                    self.driver.switch_to.window(handle)
+                    self.urls[handle] = self.driver.current_url
+            finally:
+                self.driver.switch_to.window(focused)
+        return self.urls
+
+    def find(self, url_fragment:str):
+        """Handle of an open window whose URL contains `url_fragment`, or False."""
+        for handle, url in self.refresh().items():
+            if url_fragment in url:
+                return handle
+        return False
+
+def window_registry(driver:webdriver.Chrome)->WindowRegistry:
+    # one registry per browser session, so windows already inspected are never inspected again
+    registry = getattr(driver, 'window_registry', None)
+    if registry is None:
+        registry = driver.window_registry = WindowRegistry(driver)
+    return registry
+
+class WalletPopupDetector:
+    """Finds the OKX wallet popup of one browser session once the site has asked the wallet.
+
+    `arm()` runs before the action that makes the site ask the wallet; every window open at
+    that point is stale, such as a popup left over from a failed attempt. `next_popup` polls
+    the session's windows through the WindowRegistry on the caller's thread, so nothing else
+    talks to the WebDriver session meanwhile. A handle is handed out once and is stale from then on.
+    """
+    def __init__(self, driver:webdriver.Chrome):
+        self.driver = driver
+        self.stale = set()
+
+    def arm(self):
+        self.stale = set(self.driver.window_handles)
+
+    def poll(self):
+        # one window_handles call, plus one Target.getTargets call when there are new windows
+        for handle, url in window_registry(self.driver).refresh().items():
+            if handle not in self.stale and OKX_WALLET_ID in url:
+                self.stale.add(handle)
+                return handle
+        return False
+
+    def next_popup(self, timeout:float):
+        """Handle of a wallet popup opened since `arm()`, or False after `timeout` seconds."""
+        deadline = time.monotonic() + timeout
+        interval = STEP_POLL_MIN
+        while True:
+            handle = self.poll()
+            if handle:
+                return handle
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            time.sleep(min(interval, remaining))
+            interval = min(interval * 1.5, STEP_POLL_MAX)
+
+def wallet_popups(driver:webdriver.Chrome)->WalletPopupDetector:
+    detector = getattr(driver, 'wallet_popups', None)
+    if detector is None:
+        detector = driver.wallet_popups = WalletPopupDetector(driver)
+    return detector
+
+def wallet_popup(timeout:float):
+    # polls the detector for the whole step, so the popup is picked up soon after it opens
+    return lambda driver: wallet_popups(driver).next_popup(timeout)
+
+WAITS = {
+    'clickable': probe_clickable,
+    'present': probe_present,
+    'frame': EC.frame_to_be_available_and_switch_to_it,
+    'scroll_container': in_scroll_container,
+}
+
+STEP_ACTIONS = {
+    'click': lambda driver, element: element.click(),
+    'scroll_click': lambda driver, element: scroll_and_click(driver)(element),
+    'js_click': lambda driver, element: driver.execute_script("arguments[0].click();", element),
+    'switch_window': lambda driver, handle: driver.switch_to.window(handle),
+}
+
+class FailureKind(enum.Enum):
+    TRANSIENT_UI = 'transient_ui'  # an element did not show up or went stale; a reload usually helps
+    WALLET_POPUP = 'wallet_popup'  # the OKX popup never opened or could not be switched to
+    SITE_DOWN = 'site_down'  # pages or the site API are not answering
+    FATAL = 'fatal'  # configuration or session problems that no retry fixes
+
+class TaskFailure(str):
+    """A task's failure message tagged with its FailureKind; reports still see the plain message."""
+    def __new__(cls, message:str, kind:FailureKind):
+        failure = super().__new__(cls, message)
+        failure.kind = kind
+        return failure
+
+def classify_failure(result)->FailureKind:
+    # every task failure is a TaskFailure; anything else is treated as a UI hiccup
+    return getattr(result, 'kind', FailureKind.TRANSIENT_UI)
+
+def exception_failure_kind(e:Exception)->FailureKind:
+    if isinstance(e, sException.InvalidSessionIdException):
+        return FailureKind.FATAL
+    if isinstance(e, sException.WebDriverException) and 'net::ERR_' in str(e.msg):
+        return FailureKind.SITE_DOWN
+    return FailureKind.TRANSIENT_UI
+
+class Step:
+    """One row of a task's step table, run by `run_steps`.
+
+    The step waits for `condition(driver)`, or for `wait` when no condition is given: a WAITS
+    key applied to `locator`, 'wallet_popup' for the OKX popup that a step marked
+    `opens_wallet` made the site open, or a callable taking the results of the earlier steps
+    and returning a condition. `action` is a STEP_ACTIONS key or a callable taking the
+    waited-for value. An optional step that times out is skipped; `when` (results -> bool)
+    skips the step entirely. `window='original'` and `frame='default'` move back to the
+    task's window or out of any iframe before the step. A failing step returns `error` as a
+    TaskFailure of kind `failure`, which defaults to WALLET_POPUP for steps that switch to
+    the popup and TRANSIENT_UI otherwise.
+    """
+    def __init__(self, name:str, locator:tuple=None, action=None, wait='clickable', condition=None, timeout:float=30,
+                 legacy_sleep:float=0, retries:int=0, optional:bool=False, window:str=None, frame:str=None,
+                 when=None, opens_wallet:bool=False, error:str=None, failure:FailureKind=None):
+        self.name = name
+        self.locator = locator
+        self.action = action
+        self.wait = wait
+        self.condition = condition
+        self.timeout = timeout
+        self.legacy_sleep = legacy_sleep
+        self.retries = retries
+        self.optional = optional
+        self.window = window
+        self.frame = frame
+        self.when = when
+        self.opens_wallet = opens_wallet
+        self.error = error or f'{name} not found or failed to click'
+        if failure is None:
+            popup = action == 'switch_window' or wait == 'wallet_popup'
+            failure = FailureKind.WALLET_POPUP if popup else FailureKind.TRANSIENT_UI
+        self.failure = failure
+
+def run_steps(driver:webdriver.Chrome, logger:logging.Logger, steps:list, tries:int=1, reset=None):
+    """Run a step table; return 0, or the failing step's error once `tries` runs have failed.
+
+    `reset(driver)` runs between tries. Every step is timed through run_step, so all tables
+    report the same spans. The executor tracks the current window and iframe itself, only
+    issues a switch when a step needs a different context, and always ends back on the
+    task's window. A step that needs an element an earlier step found takes it from the
+    results through a callable `wait` instead of looking it up again.
+    """
+    for attempt in range(tries):
+        drain_network_log(driver)
+        result = run_steps_once(driver, logger, steps)
+        if result == 0 or attempt == tries - 1:
+            return result
+        logger.debug(f'Step table failed ({result}), retrying')
+        if reset:
+            reset(driver)
+
+def run_steps_once(driver:webdriver.Chrome, logger:logging.Logger, steps:list):
+    original_window = driver.current_window_handle
+    window, frame = original_window, None
+    results = {}
+    try:
+        for step in steps:
+            if step.when and not step.when(results):
+                spans.add(logger, step.name, time.time(), 0, attempts=0, outcome='skipped')
+                continue
+            if step.window == 'original' and window != original_window:
+                driver.switch_to.window(original_window)
+                window, frame = original_window, None
+            if step.frame == 'default' and frame is not None:
+                driver.switch_to.default_content()
+                frame = None
+
+            action = step.action
+            if isinstance(action, str):
+                action = lambda value, name=action: STEP_ACTIONS[name](driver, value)
+
+            if step.opens_wallet:
+                wallet_popups(driver).arm()
+            if step.condition:
+                condition = step.condition
+            elif step.wait == 'wallet_popup':
+                condition = wallet_popup(step.timeout)
+            elif callable(step.wait):
+                condition = step.wait(results)
+            else:
+                condition = WAITS[step.wait](step.locator)
+            waited = {}
+            def act(value):
+                waited['value'] = value
+                return action(value) if action else value
+
+            for retry in range(step.retries + 1):
+                try:
+                    results[step.name] = run_step(driver, logger, step.name, condition, act,
+                                                  timeout=step.timeout, legacy_sleep=step.legacy_sleep)
+                    site_breaker.record(step.name, True, logger.name)
+                    break
+                except sException.TimeoutException:
+                    if retry < step.retries:
+                        logger.debug(f'{step.name} timed out, retry {retry + 1}/{step.retries}')
+                        continue
+                    if step.optional:
+                        logger.debug(f'{step.name} timed out, continuing')
+                        break
+                    logger.error(step.error)
+                    site_breaker.record(step.name, False, logger.name)
+                    return TaskFailure(step.error, step.failure)
+                except sException.NoSuchWindowException:
+                    if not step.optional:
+                        raise
+                    logger.debug(f'{step.name}: window closed, continuing')
+                    break
+            value = waited.get('value')
+
+            if step.action == 'switch_window' and step.name in results:
+                window, frame = value, None
+            elif step.wait == 'frame' and step.name in results:
+                frame = step.locator
+        return 0
+    except Exception as e:
+        logger.exception(f'Error at step {step.name}')
+        kind = exception_failure_kind(e)
+        if kind != FailureKind.FATAL:
+            site_breaker.record(step.name, False, logger.name)
+        return TaskFailure(f'Error at step {step.name}', kind)
+    finally:
+        try:
+            if window != original_window:
+                driver.switch_to.window(original_window)
+            elif frame is not None:
+                driver.switch_to.default_content()
         except:
-            logger.exception('Exception entering password')
-    
+            logger.exception('Error switching back to the task window')
+
+warm_profiles_lock = threading.Lock()
+
+def load_warm_profiles()->set:
+    try:
+        with open(warm_profiles_path) as file:
+            return set(json.load(file))
+    except FileNotFoundError:
+        return set()
+    except:
+        logger.exception('Error reading warm profiles')
+        return set()
+
+def set_profile_warm(user_id:str, warm:bool):
+    with warm_profiles_lock:
+        warm_profiles = load_warm_profiles()
+        if (user_id in warm_profiles) == warm:
+            return
+        if warm:
+            warm_profiles.add(user_id)
+        else:
+            warm_profiles.discard(user_id)
+        try:
+            with open(warm_profiles_path, mode='w') as file:
+                json.dump(sorted(warm_profiles), file)
+        except:
+            logger.exception('Error saving warm profiles')
+
+def close_other_tabs(driver:webdriver.Chrome, original_window:str):
+    for handle in driver.window_handles:
+        if handle != original_window:
+            driver.switch_to.window(handle)
+            driver.close()
+    driver.switch_to.window(original_window)
+
+def wait_for_browser_ready(driver:webdriver.Chrome, user_id:str, logger:logging.Logger)->bool:
+    # A profile that is not cached yet opens extension welcome pages and popups for a while after launch.
+    # Wait until the set of tabs has stopped changing and the OKX extension page renders, instead of a fixed 60 seconds.
+    # Profiles that came up clean once are remembered in warm_profiles.json and skip the settle wait.
+    started = time.monotonic()
+    original_window = driver.current_window_handle
+    settle = float(CONFIG.get('WARMUP_SETTLE_SECONDS') or 8)
+    timeout = float(CONFIG.get('WARMUP_TIMEOUT_SECONDS') or 60)
+
+    was_warm = user_id in load_warm_profiles() and len(driver.window_handles) == 1
+    if not was_warm:
+        logger.info(f'Waiting up to {timeout:.0f} seconds for the browser tabs to settle')
+        seen = {'handles': None, 'since': started}
+        def tabs_settled(d):
+            handles = set(d.window_handles)
+            if handles != seen['handles']:
+                seen['handles'], seen['since'] = handles, time.monotonic()
+            return time.monotonic() - seen['since'] >= settle
+        try:
+            run_step(driver, logger, 'browser_tabs_settled', tabs_settled, timeout=timeout)
+        except sException.TimeoutException:
+            logger.debug('Browser tabs still changing, continuing anyway')
+        # only a profile that opened no extra tabs is known to be cached
+        warm = len(driver.window_handles) == 1
+    close_other_tabs(driver, original_window)
+
+    driver.get(OKX_POPUP_URL)
+    try:
+        run_step(driver, logger, 'okx_extension_ready',
+                 lambda d: d.execute_script("return document.readyState === 'complete' && document.body.querySelector('input, button') !== null"),
+                 timeout=max(timeout - (time.monotonic() - started), settle))
+    except sException.TimeoutException:
+        logger.error('OKX extension page did not respond')
+        set_profile_warm(user_id, False)
+        return False
+
+    if not was_warm:
+        set_profile_warm(user_id, warm)
+    record_step_saving('browser_warmup', max(0, 60 - (time.monotonic() - started)))
+    logger.info(f'Browser ready in {time.monotonic() - started:.1f}s')
+    return True
+
+def wallet_login(driver:webdriver.Chrome, logger:logging.Logger):
+    # Open OKX wallet login page
+    driver.get(OKX_POPUP_URL)
+
+    def unlock(password_field):
+        password_field.click() # shifting focus to input field
+        password_field.send_keys(CONFIG['WALLET_PASSWORD']) # type password
+        password_field.send_keys(Keys.RETURN) # press Enter key
+        driver.refresh()
+        driver.execute_script(f"window.open('{SITE_URL}/en/point', '_blank');")
+
+    try:
+        run_step(driver, logger, 'wallet_password',
+                 probe_clickable((By.CSS_SELECTOR, 'input[type="password"]')), unlock,
+                 timeout=20, legacy_sleep=2)
+        handles = run_step(driver, logger, 'website_tab',
+                           lambda d: d.window_handles if len(d.window_handles) > 1 else False,
+                           timeout=10, legacy_sleep=5)
+    except sException.TimeoutException:
+        logger.debug('Timeout clicking password field')
+        if driver.find_elements(By.XPATH, f"//span[text()='Create wallet']"):
+            logger.error('Wallet is not imported')
+        return
+    except:
+        logger.exception('Exception entering password')
+        return
+
     try:
         for i in range(2):
             try:
@@ -208,96 +1605,166 @@ def wallet_login(driver:webdriver.Chrome, logger:logging.Logger):
         return
 
 def is_website_logged_in(driver:webdriver.Chrome, logger:logging.Logger)->bool:
-    driver.get('https://pioneer.particle.network/en/point')
-    login_status=False
-    for _ in range(10):
-        try:
-            time.sleep(1)
-            btn = driver.find_element(By.CLASS_NAME,'polygon-btn-text')
-            if btn:
-                btn_text = btn.text
-                if btn_text[:2] == '0X':
-                    login_status = True
-                    break
-        except:
-            pass
-
-    return login_status
+    driver.get(f'{SITE_URL}/en/point')
+    try:
+        return run_step(driver, logger, 'website_login_status',
+                        probe_text((By.CLASS_NAME, 'polygon-btn-text'), lambda text: text[:2] == '0X'),
+                        timeout=10)
+    except sException.TimeoutException:
+        return False
 
 def task1(driver:webdriver.Chrome, logger:logging.Logger):
     logger.info('Task1 started')
     if not wallet_login(driver, logger):
         if is_website_logged_in(driver, logger):
             logger.debug('Wallet login failed')
-            return "Wallet login failed"
+            return TaskFailure("Wallet login failed", FailureKind.TRANSIENT_UI)
 
     if not is_website_logged_in(driver, logger):
         original_window = driver.window_handles[0]
         def authorize_in_wallet(driver:webdriver.Chrome, logger:logging.Logger, original_window:str):
             if len(driver.window_handles) > 1:
-                driver.switch_to.window(driver.window_handles[-1])
-                if 'mcohilncbfahbmgdjkbpemcciiolgcge' in driver.current_url:
+                wallet_window = window_registry(driver).find(OKX_WALLET_ID)
+                if wallet_window:
+                    driver.switch_to.window(wallet_window)
                     try:
-                        confirm_button = WebDriverWait(driver, 20).until(
-                            EC.element_to_be_clickable((By.CLASS_NAME, 'btn-fill-highlight'))
-                        )
-                        confirm_button.click()
-                        time.sleep(5)
+                        run_step(driver, logger, 'wallet_authorize_login',
+                                 probe_clickable((By.CLASS_NAME, 'btn-fill-highlight')), click,
+                                 timeout=20)
+                        # the wallet popup closes itself once the request is authorized
+                        try:
+                            run_step(driver, logger, 'wallet_authorize_close',
+                                     lambda d: len(d.window_handles) == 1, timeout=5, legacy_sleep=5)
+                        except sException.TimeoutException:
+                            pass
                         driver.switch_to.window(original_window)
                         logger.debug('Login request authorized in wallet')
                         return 0
-                    except Exception as e: 
+                    except Exception as e:
                         logger.error(f'Error authorizing login request in wallet: {e}')
-                        return "Error authorizing login request in wallet"
+                        return TaskFailure("Error authorizing login request in wallet", FailureKind.WALLET_POPUP)
                 else:
-                    driver.switch_to.window(original_window)
-                    logger.debug(f'Window is not for okx wallet login- {driver.current_url}')
-                    return "Website login failed"
+                    logger.debug(f'No okx wallet login window among {list(window_registry(driver).urls.values())}')
+                    return TaskFailure("Website login failed", FailureKind.WALLET_POPUP)
             else:
                 logger.debug('Website login failed')
-                return "Website login failed"
-        
+                return TaskFailure("Website login failed", FailureKind.WALLET_POPUP)
+
         result = authorize_in_wallet(driver, logger, original_window)
         if result == 0:
             if not is_website_logged_in(driver, logger):
                 logger.debug('Website login failed')
-                return "Website login failed"
+                return TaskFailure("Website login failed", FailureKind.TRANSIENT_UI)
         else:
             try:
-                join_now = WebDriverWait(driver, 5).until(
-                    EC.element_to_be_clickable((By.CLASS_NAME,'polygon-btn-wrap'))
-                )
-                join_now.click()
-                okc_wallet_button = WebDriverWait(driver, 10).until(
-                    EC.element_to_be_clickable((By.XPATH,"//span[text()='okx Wallet']"))
-                )
-                okc_wallet_button.click()
+                run_step(driver, logger, 'join_now',
+                         probe_clickable((By.CLASS_NAME,'polygon-btn-wrap')), click, timeout=5)
+                run_step(driver, logger, 'okx_wallet_button',
+                         probe_clickable((By.XPATH,"//span[text()='okx Wallet']")), click, timeout=10)
                 result = authorize_in_wallet(driver, logger, original_window)
                 if result == 0:
                     if not is_website_logged_in(driver, logger):
                         logger.debug('Website login failed')
-                        return "Website login failed"
-            except:
+                        return TaskFailure("Website login failed", FailureKind.TRANSIENT_UI)
+            except Exception as e:
                 logger.exception('Error connecting wallet to website')
-                return "Error connecting wallet to website"        
+                return TaskFailure("Error connecting wallet to website", exception_failure_kind(e))
 
     #Task1 Success
     return 0
 
-def wait_for_xhr_request(driver:webdriver.Chrome, url_to_wait_for, event:threading.Event, logger:logging.Logger):
-    # Continuously check logs for the desired XHR request
-    while not event.is_set():
-        logs = driver.get_log('performance')
-        for entry in logs:
-            if 'Network.responseReceived' in entry['message']:
-                message = entry['message']
-                if url_to_wait_for in message:
-                    event.set()
-                    break
+class NetworkLog:
+    """Ring buffer of the response URLs in a session's performance log.
+
+    Only sessions opened with `capture_network` have one. Chromedriver holds performance
+    entries until they are read, so the log is drained before every step table; only
+    Network.responseReceived URLs are kept, and at most `maxlen` of them.
+    """
+    def __init__(self, driver:webdriver.Chrome, logger:logging.Logger, maxlen:int=1000):
+        self.driver = driver
+        self.logger = logger
+        self.responses = collections.deque(maxlen=maxlen)
+
+    def drain(self):
+        for entry in self.driver.get_log('performance'):
+            message = entry['message']
+            if 'Network.responseReceived' not in message:
+                continue
+            try:
+                event = json.loads(message)['message']
+                if event['method'] == 'Network.responseReceived':
+                    self.responses.append(event['params']['response']['url'])
+            except (ValueError, KeyError):
+                self.logger.debug('Unparsable performance log entry')
+
+    def clear(self):
+        self.drain()
+        self.responses.clear()
+
+    def pop_all(self)->list:
+        self.drain()
+        urls = list(self.responses)
+        self.responses.clear()
+        return urls
+
+def drain_network_log(driver:webdriver.Chrome):
+    network_log = getattr(driver, 'network_log', None)
+    if network_log is not None:
+        network_log.drain()
+
+# tasks that wait on network responses; only their sessions capture the performance log
+NETWORK_CAPTURE_TASKS = {'task2'}
+
+class NetworkListener:
+    """Network.responseReceived subscription for one browser session.
+
+    Events come from the session's NetworkLog. Nothing runs in the background:
+    `wait_for` drains the log on the caller's thread every `poll_interval` seconds
+    until a response URL matches, the deadline passes or the listener is cancelled.
+    """
+    def __init__(self, driver:webdriver.Chrome, logger:logging.Logger, poll_interval:float=0.5):
+        self.network_log = getattr(driver, 'network_log', None)
+        if self.network_log is None:
+            raise RuntimeError('Network capture is not enabled for this browser session')
+        self.logger = logger
+        self.poll_interval = poll_interval
+        self.cancelled = threading.Event()
+
+    def subscribe(self):
+        # responses logged before subscribing belong to earlier steps
+        self.network_log.clear()
+        self.cancelled.clear()
+        return self
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def __enter__(self):
+        return self.subscribe()
+
+    def __exit__(self, *exc):
+        self.cancel()
+
+    def response_urls(self)->list:
+        return self.network_log.pop_all()
+
+    def wait_for(self, url_pattern:str, timeout:float)->bool:
+        """Block until a response whose URL contains `url_pattern` is received; False on timeout or cancel."""
+        deadline = time.monotonic() + timeout
+        try:
+            while not self.cancelled.is_set():
+                if any(url_pattern in url for url in self.response_urls()):
+                    return True
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self.cancelled.wait(min(self.poll_interval, remaining))
+            return False
+        finally:
+            self.cancel()
 
 def task2(driver:webdriver.Chrome, logger:logging.Logger):
     logger.info('Task2 started')
-    original_window = driver.current_window_handle
 
     # Click deposit button
     # try:
@@ -327,1233 +1794,1382 @@ def task2(driver:webdriver.Chrome, logger:logging.Logger):
     #     return "Error clicking deposit button"
 
     # Go to deposit page
-    driver.get('https://pioneer.particle.network/en/universalGas')
-
-    time.sleep(2)
-    # Enter deposit amount
-    try:
-        logger.debug('Entering deposit amount')
-        for _ in range(5): # retry stale element
-            time.sleep(1)
-            try:
-                deposit_amount_field = WebDriverWait(driver, 5).until(
-                    EC.element_to_be_clickable((By.CSS_SELECTOR, 'input[placeholder="0.00"]'))
-                )
-                deposit_amount_field.click()
-                time.sleep(0.5)
-                TASK_2_AMOUNT_MIN = float(CONFIG['TASK_2_AMOUNT_MIN'])
-                TASK_2_AMOUNT_MAX = float(CONFIG['TASK_2_AMOUNT_MAX'])
-                TASK2_DEPOSIT_AMOUNT = str(round(random.uniform(TASK_2_AMOUNT_MIN, TASK_2_AMOUNT_MAX), 3))
-                deposit_amount_field.send_keys(TASK2_DEPOSIT_AMOUNT)
-                time.sleep(2)
-                deposit_amount_field.send_keys(Keys.RETURN)
-                logger.debug('deposit amount entered')
-                break
-            except sException.TimeoutException:
-                logger.debug('Timeout entering deposit amount')
-            except:
-                logger.exception('Exception entering deposit amount')
-    except:
-        logger.exception('Error entering deposit amount')
-        return "Error entering deposit amount"
-    
-    # Confirm payment in wallet
-    try:
-        logger.debug('Confirming payment in wallet')
-        # Switch to the new window
-        switched_to_popup = False
-        for _ in range(40):
-            time.sleep(1)
-            if len(driver.window_handles) > 1:
-                driver.switch_to.window(driver.window_handles[-1])
-                switched_to_popup = True
-                break
-        
-        if not switched_to_popup:
-            logger.error('Failed to switch to the wallet popup window')
-            return "Failed to switch to the wallet popup window"
-        
-        time.sleep(2)
-        
-        # Click first confirm button
-        try:
-            logger.debug('Clicking confirm button')
-            first_confirmation = False
-            for _ in range(5): # retry stale element
-                time.sleep(1)
-                try:
-                    first_confirmation_button = WebDriverWait(driver, 20).until(
-                        EC.presence_of_element_located((By.CLASS_NAME, 'btn-fill-highlight'))
-                    )
-                    first_confirmation_button.click()
-                    logger.debug('first confirm button clicked')
-                    first_confirmation = True
-                    break
-                except sException.TimeoutException:
-                    logger.debug('Timeout clicking first confirm button')
-                except:
-                    logger.exception('Exception clicking first confirm button')
-            if not first_confirmation:
-                logger.error('First confirm button not found or failed to click')
-                return "First confirm button not found or failed to click"
-        except:
-            logger.exception('Error clicking first confirm button')
-            return "Error clicking first confirm button"
-        
-        time.sleep(1)
-
-        # Click second confirm button
-        try:
-            logger.debug('Clicking second confirm button')
-            second_confirmation = False
-            second_confirmation_not_asked = False
-            for _ in range(5): # retry stale element
-                time.sleep(1)
-                try:
-                    second_confirmation_button = WebDriverWait(driver, 10).until(
-                        EC.element_to_be_clickable((By.CLASS_NAME, 'btn-fill-highlight'))
-                    )
-                    second_confirmation_button.click()
-                    logger.debug('second confirm button click')
-                    second_confirmation = True
-                    break
-                except sException.TimeoutException:
-                    logger.debug('Timeout clicking second confirm button')
-                except sException.NoSuchWindowException:
-                    logger.debug('Wallet window closed without asking second confirmation')
-                    second_confirmation_not_asked = True
-                    break
-                except:
-                    logger.exception('Exception entering second confirm button')
-        except:
-            logger.exception('Error clicking second confirm button')
-            return "Error clicking second confirm button"
-    except:
-        logger.exception('Error confirming payment in wallet')
-        return "Error confirming payment in wallet"
-    finally:
-        # Switch back to the original window
-        driver.switch_to.window(original_window)
+    driver.get(f'{SITE_URL}/en/universalGas')
+    deposit_listener = NetworkListener(driver, logger).subscribe()
+
+    TASK_2_AMOUNT_MIN = float(CONFIG['TASK_2_AMOUNT_MIN'])
+    TASK_2_AMOUNT_MAX = float(CONFIG['TASK_2_AMOUNT_MAX'])
+    TASK2_DEPOSIT_AMOUNT = str(round(random.uniform(TASK_2_AMOUNT_MIN, TASK_2_AMOUNT_MAX), 3))
+
+    def enter_deposit_amount(deposit_amount_field):
+        deposit_amount_field.click()
+        deposit_amount_field.send_keys(TASK2_DEPOSIT_AMOUNT)
+        # submit only once the input holds the whole amount
+        run_step(driver, logger, 'deposit_amount_value',
+                 lambda d: deposit_amount_field.get_attribute('value') == TASK2_DEPOSIT_AMOUNT, timeout=5)
+        deposit_amount_field.send_keys(Keys.RETURN)
+
+    def confirm(button):
+        button.click()
+        return button
+
+    # Enter deposit amount, then confirm the payment in the wallet popup
+    result = run_steps(driver, logger, [
+        Step('deposit_amount', (By.CSS_SELECTOR, 'input[placeholder="0.00"]'), enter_deposit_amount,
+             timeout=30, legacy_sleep=5.5, opens_wallet=True, error='Timeout entering deposit amount'),
+        Step('deposit_wallet_popup', action='switch_window', wait='wallet_popup',
+             timeout=40, error='Failed to switch to the wallet popup window'),
+        Step('deposit_first_confirm', (By.CLASS_NAME, 'btn-fill-highlight'), confirm, wait='present',
+             timeout=100, legacy_sleep=3, error='First confirm button not found or failed to click'),
+        # the wallet may close without asking for a second confirmation
+        Step('deposit_second_confirm', action='click',
+             wait=lambda results: clickable_replacement(results['deposit_first_confirm'], (By.CLASS_NAME, 'btn-fill-highlight'), grace=2),
+             timeout=10, legacy_sleep=2, optional=True),
+    ])
+    if result != 0:
+        return result
 
     # Wait por deposit to be processed
     try:
-        url_to_wait_for = 'https://pioneer-api.particle.network/deposits?timestamp'
-
-        # Create an event to signal when the XHR request is detected
-        event = threading.Event()
-
-        # Create and start the thread
-        thread = threading.Thread(target=wait_for_xhr_request, args=(driver, url_to_wait_for, event, logger))
-        thread.start()
+        url_to_wait_for = f'{SITE_API_URL}/deposits?timestamp'
 
         logger.info('Waiting for payment confirmation request (max 5 minutes)')
-        # Main thread can continue working and wait for the event
-        event.wait(timeout=300)
+        deposit_confirmed = deposit_listener.wait_for(url_to_wait_for, timeout=300)
 
-        if event.is_set():
+        if deposit_confirmed:
             logger.info("Deposit confirmed")
         else:
             logger.error("Timeout waiting for payment confirmation request")
-            return "Timeout waiting for payment confirmation request"
+            return TaskFailure("Timeout waiting for payment confirmation request", FailureKind.SITE_DOWN)
     except:
         logger.exception('Error waiting for payment confirmation request')
-        return "Error waiting for payment confirmation request"
-    
-    # Press Back button
-    try:
-        back_button_clicked = False
-        for _ in range(5): # retry stale element
-            time.sleep(1)
-            try:
-                back_button_text = 'back'
-                back_button = WebDriverWait(driver, 5).until(
-                    EC.element_to_be_clickable((By.XPATH, f"//div[text()='{back_button_text}']"))
-                )
-                back_button.click()
-                back_button_clicked = True
-                logger.debug('back button clicked')
-                break
-            except sException.TimeoutException:
-                logger.debug('Timeout clicking back button')
-            except:
-                logger.exception('Exception in back button')
-
-        # Task2 Success
-        if back_button_clicked:
-            logger.debug('Waiting 10 seconds for amount to be reflected in wallet')
-            time.sleep(10)
-            return 0
-        else:
-            logger.error('Back button not found or failed to click')
-            return "Back button not found or failed to click"
-    except:
-        logger.exception('Error clicking back button')
-        return "Error clicking back button"
-
-def task3(driver:webdriver.Chrome, logger:logging.Logger, wallet_address):
-    original_window = driver.current_window_handle
+        return TaskFailure("Error waiting for payment confirmation request", FailureKind.SITE_DOWN)
 
-    def task3_intermediate():
-        # Click open wallet button
-        try:
-            logger.debug('Clicking open wallet button')
-            open_wallet_button_clicked = False
-            for _ in range(5): # retry stale element
-                time.sleep(1)
-                try:
-                    open_wallet_button_text = 'Open Wallet'
-                    open_wallet_button = WebDriverWait(driver, 5).until(
-                        EC.element_to_be_clickable((By.XPATH, f"//button[.//span[text()='{open_wallet_button_text}']]"))
-                    )
-                    driver.execute_script("arguments[0].scrollIntoView(true);", open_wallet_button)
-                    time.sleep(0.5)
-
-                    if open_wallet_button:
-                        logger.debug('open_wallet_button found')
-                    else:
-                        logger.debug('open_wallet_button missing')
-                    open_wallet_button.click()
-                    logger.debug('open_wallet_button clicked')
-                    open_wallet_button_clicked = True
-                    break
-                except sException.TimeoutException:
-                    logger.debug('Timeout clicking open wallet button')
-                except:
-                    logger.exception('Exception clicking open wallet button')
+    # Press Back button
+    result = run_steps(driver, logger, [
+        Step('deposit_back', (By.XPATH, "//div[text()='back']"), 'click', timeout=30, legacy_sleep=1,
+             error='Back button not found or failed to click'),
+    ])
+    if result != 0:
+        return result
+
+    # Task2 Success
+    logger.debug(f'Waiting {BALANCE_SETTLE_SECONDS:.0f} seconds for amount to be reflected in wallet')
+    time.sleep(BALANCE_SETTLE_SECONDS)
+    return 0
 
-            if not open_wallet_button_clicked:
-                logger.error('open_wallet_button not found or failed to click')
-                return "open_wallet_button not found or failed to click"
-        except:
-            logger.exception('Error clicking open_wallet_button')
-            return "Error clicking open_wallet_button"
+WALLET_IFRAME = (By.CSS_SELECTOR, 'iframe')
 
-        # Switch to iframe wallet
-        try:
-            # Wait for the iframe to be present
-            iframe = WebDriverWait(driver, 60).until(
-                EC.frame_to_be_available_and_switch_to_it((By.CSS_SELECTOR, 'iframe'))
-            )
-            if iframe:
-                logger.debug('Switched to iframe wallet')
-        except sException.TimeoutException:
-            logger.debug('Timeout switching to iframe wallet')
-            return "Timeout switching to iframe wallet"
-        except:
-            logger.exception('Error switching to iframe wallet')
-            return "Error switching to iframe wallet"
+def task3_send_steps(wallet_address:str, chain_choice:str)->list:
+    # Send a little USDG from the Particle wallet iframe and confirm it in the OKX popup
+    def chain_already_selected(choose_chain_button):
+        if choose_chain_button.find_element(By.TAG_NAME, "span").text == chain_choice:
+            return True
+        choose_chain_button.click()
+        return False
+
+    def enter_wallet_address(textarea):
+        textarea.click()
+        textarea.send_keys(wallet_address)
+
+    def enter_amount(amount_field):
+        amount_field.click()
+        amount = str(round(random.uniform(0.01, 0.10), 2))
+        amount_field.send_keys(amount)
+        amount_field.send_keys(Keys.RETURN) # Press Enter to submit
+
+    return [
+        Step('open_wallet_button', (By.XPATH, "//button[.//span[text()='Open Wallet']]"), 'scroll_click',
+             timeout=30, legacy_sleep=1.5),
+        Step('iframe_wallet', WALLET_IFRAME, wait='frame', timeout=60, error='Timeout switching to iframe wallet'),
+        Step('send_button', (By.CLASS_NAME, 'icon-button-default'), 'click', timeout=55, legacy_sleep=7),
+        Step('choose_token_button', (By.CLASS_NAME, 'choose-token'), 'click', timeout=100, legacy_sleep=2),
+        Step('token_item_button', (By.CSS_SELECTOR, '[data-key="Ethereum_0_USDG_USDG"]'), 'click',
+             wait='scroll_container', timeout=100, legacy_sleep=3),
+        Step('choose_chain_button', (By.CLASS_NAME, 'choose-chain'), chain_already_selected, timeout=100, legacy_sleep=2),
+        Step('chain_item_button', (By.XPATH, f"//div[span[text()='{chain_choice}']]"), 'click',
+             wait='scroll_container', timeout=100, legacy_sleep=3,
+             when=lambda results: not results['choose_chain_button']),
+        Step('wallet_address', (By.ID, 'send_to'), enter_wallet_address, timeout=5, legacy_sleep=1,
+             error='Failed to enter wallet address'),
+        Step('send_amount', (By.ID, 'send_amount'), enter_amount, timeout=5, legacy_sleep=1,
+             error='Failed to enter amount'),
+        Step('swap_send_button', (By.CLASS_NAME, 'swap-btn'), 'click', timeout=100, legacy_sleep=1, opens_wallet=True),
+        # the captcha has to be solved before the wallet popup opens
+        Step('send_wallet_popup', action='switch_window', wait='wallet_popup', timeout=60,
+             error='Failed to switch to the wallet popup window'),
+        Step('send_first_confirm', (By.CLASS_NAME, 'btn-fill-highlight'), 'click', wait='present',
+             timeout=100, legacy_sleep=3, error='First confirm button not found or failed to click'),
+    ]
+
+TASK3_RESULT_STEPS = [
+    Step('result_iframe_wallet', WALLET_IFRAME, wait='frame', timeout=100, legacy_sleep=1, optional=True),
+    Step('send_transaction_result',
+         condition=probe_text((By.CLASS_NAME, 'transaction-result-container'), lambda text: 'view on block explorer' in text.lower()),
+         timeout=100, legacy_sleep=3, optional=True),
+    Step('result_cross_button', (By.CLASS_NAME, 'ant-drawer-open'),
+         lambda drawer: drawer.find_element(By.CLASS_NAME, 'ant-drawer-extra').click(),
+         timeout=100, optional=True),
+    Step('close_wallet_popup', (By.CLASS_NAME, 'particle-pwe-btn'), 'click', frame='default',
+         timeout=100, error='Timeout closing wallet popup'),
+]
 
-        # Copy wallet address and Click send button
-        try:
-            time.sleep(5)
-            logger.debug('Clicking send button')
-            send_clicked = False
-            for _ in range(5): # retry stale element
-                time.sleep(1)
-                try:
-                    # Copy wallet address to clipboard
-                    # wallet_address_button = WebDriverWait(driver, 10).until(
-                    #     EC.element_to_be_clickable((By.CLASS_NAME, 'copy-wrap'))
-                    # )
-                    # wallet_address_button.click()
-                    # time.sleep(0.3)
-                    # wallet_address = pyperclip.paste()
-
-                    send_button = WebDriverWait(driver, 10).until(
-                        EC.element_to_be_clickable((By.CLASS_NAME, 'icon-button-default'))
-                        )
-        
-                    if send_button:
-                        logger.debug('send found')
-                    else:
-                        logger.debug('send missing')
-                    time.sleep(1)
-                    send_button.click()
-                    logger.debug('send clicked')
-                    send_clicked = True
-                    break
-                except sException.TimeoutException:
-                    logger.debug('Timeout send button step')
-                except:
-                    logger.exception('Exception clicking send button')
-            if not send_clicked:
-                logger.error('Send button not found or failed to click')
-                return "Send button not found or failed to click"
-        except:
-            logger.exception('Error clicking send button')
-            return "Error clicking send button"
-    
-        # Click Choose Token Button
-        try:
-            logger.debug('Clicking choose_token button')
-            choose_token_clicked = False
-            for _ in range(5): # retry stale element
-                time.sleep(1)
-                try:
-                    choose_token_button = WebDriverWait(driver, 20).until(
-                        EC.element_to_be_clickable((By.CLASS_NAME, 'choose-token'))
-                        )
-        
-                    if choose_token_button:
-                        logger.debug('choose_token button found')
-                    else:
-                        logger.debug('choose_token button missing')
-                    time.sleep(1)
-                    choose_token_button.click()
-                    logger.debug('choose_token button clicked')
-                    choose_token_clicked = True
-                    break
-                except sException.TimeoutException:
-                    logger.debug('Timeout clicking choose token button')
-                except:
-                    logger.exception('Exception clicking choose token button')
-            if not choose_token_clicked:
-                logger.error('choose_token button not found or failed to click')
-                return "choose_token button not found or failed to click"
-        except:
-            logger.exception('Error clicking choose_token button')
-            return "Error clicking choose_token button"
+def task3(driver:webdriver.Chrome, logger:logging.Logger, wallet_address):
+    TASK_3_CHAINS = CONFIG['TASK_3_CHAINS']
+    if TASK_3_CHAINS:
+        TASK_3_CHAINS = [c.strip() for c in TASK_3_CHAINS.split(',')]
+    else:
+        logger.error("Could not get task3 chains from .env")
+        return TaskFailure("Could not get task3 chains from .env", FailureKind.FATAL)
+    chain_choice = random.choice(TASK_3_CHAINS)
+    logger.debug(f'Choosing {chain_choice} chain')
+
+    result = run_steps(driver, logger, task3_send_steps(wallet_address, chain_choice),
+                       tries=3, reset=lambda d: d.get(f'{SITE_URL}/en/point'))
+    if result != 0:
+        return result
+    # TASK3 SUCCESS once the wallet is closed again
+    return run_steps(driver, logger, TASK3_RESULT_STEPS)
+
+TASK4_PURCHASE_STEPS = [
+    Step('purchase_button', (By.XPATH, "//button[.//span[text()='Purchase']]"), 'scroll_click',
+         timeout=30, legacy_sleep=3, error='purchase__button not found or failed to click'),
+    Step('usdg_token_button', (By.XPATH, "//div[text()='usdg']"), 'click', timeout=30, legacy_sleep=3),
+    Step('next_button', (By.XPATH, "//button[.//span[text()='Next']]"), 'click', timeout=30, legacy_sleep=3),
+    # a click intercepted by the modal's opening animation simply re-polls
+    Step('purchase2_button', (By.XPATH, "//div[@class='react-responsive-modal-modal']//button[.//span[text()='Purchase']]"), 'click',
+         timeout=30, legacy_sleep=11, opens_wallet=True),
+]
 
-        # Choose Appropriate Token
-        try:
-            logger.debug('Choosing USDG token')
-            token_item_clicked = False
-            for _ in range(5): # retry stale element
-                time.sleep(1)
-                try:
-                    scroll_div = WebDriverWait(driver, 20).until(
-                        EC.presence_of_element_located((By.CLASS_NAME, 'scrollContainer'))
-                        )
-                    if not scroll_div:
-                        logger.error('scroll_div not found on wallet page')
-                        return "scroll_div not found on wallet page"
-                    
-                    time.sleep(1)
-                    token_item_button = WebDriverWait(driver, 20).until(
-                        EC.element_to_be_clickable((By.CSS_SELECTOR, '[data-key="Ethereum_0_USDG_USDG"]'))
-                        )
-        
-                    if token_item_button:
-                        logger.debug('token_item button found')
-                    else:
-                        logger.debug('token_item button missing')
-                    time.sleep(1)
-                    token_item_button.click()
-                    logger.debug('token_item button clicked')
-                    token_item_clicked = True
-                    break
-                except sException.TimeoutException:
-                    logger.debug('Timeout clicking token button')
-                except:
-                    logger.exception('Exception clicking token button')
-            if not token_item_clicked:
-                logger.error('token_item button not found or failed to click')
-                return "token_item button not found or failed to click"
-        except:
-            logger.exception('Error clicking token_item button')
-            return "Error clicking token_item button"
-        
-        TASK_3_CHAINS = CONFIG['TASK_3_CHAINS']
-        if TASK_3_CHAINS:
-            TASK_3_CHAINS = [c.strip() for c in TASK_3_CHAINS.split(',')]
-        else:
-            logger.error("Could not get task3 chains from .env")
-            return "Could not get task3 chains from .env"
-        chain_choice = random.choice(TASK_3_CHAINS)
-        logger.debug(f'Choosing {chain_choice} chain')
-        already_selected = False
-        # Click Choose Chain Button
-        try:
-            logger.debug('Clicking choose_chain button')
-            choose_chain_clicked = False
-            for _ in range(5): # retry stale element
-                time.sleep(1)
-                try:
-                    choose_chain_button = WebDriverWait(driver, 20).until(
-                        EC.element_to_be_clickable((By.CLASS_NAME, 'choose-chain'))
-                        )
-                    if choose_chain_button.find_element(By.TAG_NAME, "span").text == chain_choice:
-                        logger.debug(f'{chain_choice} chain already selected')
-                        already_selected = True
-                        choose_chain_clicked = True
-                        break 
-                    if choose_chain_button:
-                        logger.debug('choose_chain button found')
-                    else:
-                        logger.debug('choose_chain button missing')
-                    time.sleep(1)
-                    choose_chain_button.click()
-                    logger.debug('choose_chain button clicked')
-                    choose_chain_clicked = True
-                    break
-                except sException.TimeoutException:
-                    logger.debug('Timeout clicking choose token button')
-                except:
-                    logger.exception('Exception clicking choose token button')
-            if not choose_chain_clicked:
-                logger.error('choose_chain button not found or failed to click')
-                return "choose_chain button not found or failed to click"
-        except:
-            logger.exception('Error clicking choose_chain button')
-            return "Error clicking choose_chain button"
+def task4(driver:webdriver.Chrome, logger:logging.Logger):
+    result = run_steps(driver, logger, [
+        Step('purchase_nft_button', (By.XPATH, "//button[.//span[text()='Purchase NFT']]"), 'scroll_click',
+             timeout=30, legacy_sleep=1.5, error='purchase_nft__button not found or failed to click'),
+    ])
+    if result != 0:
+        return result
 
-        
-        if not already_selected:
-            # Choose Chain Randomly
-            try:
-                chain_item_clicked = False
-                for _ in range(5): # retry stale element
-                    time.sleep(1)
-                    try:
-                        scroll_div = WebDriverWait(driver, 20).until(
-                            EC.presence_of_element_located((By.CLASS_NAME, 'scrollContainer'))
-                            )
-                        if not scroll_div:
-                            logger.error('scroll_div not found on wallet page')
-                            return "scroll_div not found on wallet page"
-                        
-                        time.sleep(1)
-                        chain_item_button = WebDriverWait(driver, 20).until(
-                            
-                            EC.element_to_be_clickable(( By.XPATH, f"//div[span[text()='{chain_choice}']]"))
-                        )
-            
-                        if chain_item_button:
-                            logger.debug('chain_item button found')
-                        else:
-                            logger.debug('chain_item button missing')
-                        time.sleep(1)
-                        chain_item_button.click()
-                        logger.debug('chain_item button clicked')
-                        chain_item_clicked = True
-                        break
-                    except sException.TimeoutException:
-                        logger.debug('Timeout clicking token button')
-                    except:
-                        logger.exception('Exception clicking token button')
-                if not chain_item_clicked:
-                    logger.error('chain_item button not found or failed to click')
-                    return "chain_item button not found or failed to click"
-            except:
-                logger.exception('Error clicking chain_item button')
-                return "Error clicking chain_item button"
-        
-        # Enter wallet address
-        try:
-            logger.debug('Entering wallet address')
-            wallet_address_entered = False
-            for _ in range(5):
-                try:
-                    time.sleep(1)
-                    textarea = driver.find_element(By.ID, 'send_to')
-                    textarea.click()
-                    textarea.send_keys(wallet_address)
-                    wallet_address_entered = True
-                    break
-                except:
-                    logger.exception('Exception entering wallet address')
-            if not wallet_address_entered:
-                logger.error('Failed to enter wallet address')
-                return "Failed to enter wallet address"
-        except:
-            logger.exception('Error entering wallet address')
-            return "Error entering wallet address"
-        
-        # Enter amount
-        try:
-            logger.debug('Entering amount')
-            amount_entered = False
-            for _ in range(5):
-                try:
-                    time.sleep(1)
-                    amount_field = driver.find_element(By.ID, 'send_amount')
-                    amount_field.click()
-                    amount = str(round(random.uniform(0.01, 0.10), 2))
-                    amount_field.send_keys(amount)
-                    amount_field.send_keys(Keys.RETURN) # Press Enter to submit
-                    amount_entered = True
-                    break
-                except:
-                    logger.exception('Exception entering amount')
-            if not amount_entered:
-                logger.error('Failed to enter amount')
-                return "Failed to enter amount"
-        except:
-            logger.exception('Error entering amount')
-            return "Error entering amount"
-        
-        # Click Send button (Swap)
-        try:
-            logger.debug('Clicking swap_send button')
-            swap_send_button_clicked = False
-            for _ in range(5): # retry stale element
-                time.sleep(1)
-                try:
-                    swap_send_button = WebDriverWait(driver, 20).until(
-                            EC.element_to_be_clickable((By.CLASS_NAME, 'swap-btn'))
-                        )
-        
-                    if swap_send_button:
-                        logger.debug('swap_send button found')
-                    else:
-                        logger.debug('swap_send button missing')
+    result = run_steps(driver, logger, TASK4_PURCHASE_STEPS, tries=3, reset=lambda d: d.refresh())
+    if result != 0:
+        return TaskFailure('Failed please check the logs', classify_failure(result))
 
-                    swap_send_button.click()
-                    logger.debug('swap_send button clicked')
-                    swap_send_button_clicked = True
-                    break
-                except sException.TimeoutException:
-                    logger.debug('Timeout clicking swap send button')
-                except:
-                    logger.exception('Exception clicking swap send button ')
+    # After clicking Purchase2 button we get a captcha before redirecting to wallet confirmation
+    last_purchase = time.monotonic()
+    def wallet_popup_or_retry(d):
+        # Wait for captcha get solved and eventually new window appear
+        nonlocal last_purchase
+        popup = wallet_popups(d).next_popup(timeout=1)
+        if popup:
+            return popup
+        if d.find_elements(By.CSS_SELECTOR , 'div[role="alert"]'):
+            logger.debug('Captcha solver failed to solve the captcha')
+        elif time.monotonic() - last_purchase < 60:
+            return False
+        d.refresh()
+        run_steps(d, logger, TASK4_PURCHASE_STEPS)
+        last_purchase = time.monotonic()
+        return False
+
+    # TASK4 SUCCESS once back on the NFT page; the next run waits on Purchase NFT itself
+    return run_steps(driver, logger, [
+        Step('purchase_wallet_popup', action='switch_window', condition=wallet_popup_or_retry, timeout=600,
+             error='Failed to switch to the wallet popup window'),
+        Step('purchase_first_confirm', (By.CLASS_NAME, 'btn-fill-highlight'), 'click', wait='present',
+             timeout=100, legacy_sleep=3, error='First confirm button not found or failed to click'),
+        Step('purchase_transaction_result', window='original',
+             condition=probe_text((By.CLASS_NAME, 'react-responsive-modal-modal'), lambda text: 'successfully' in text.lower()),
+             timeout=150, legacy_sleep=1, optional=True),
+        Step('purchase_result_close', (By.CLASS_NAME, 'react-responsive-modal-closeButton'), 'click', wait='present',
+             timeout=100, legacy_sleep=1, error='nft transaction confirmation popup not found or failed to click'),
+        Step('purchase_back', (By.XPATH, "//div[text()='back']"), 'click', timeout=30, legacy_sleep=6,
+             error='Back button not found or failed to click'),
+    ])
+
+CONFIRM_BUTTON_QUERY = [dom_query((By.XPATH, "//button[.//div[text()='Confirm']]"), attributes=('data-disabled',))]
+
+def enabled_confirm_button(driver:webdriver.Chrome):
+    # Confirm buttons render clickable first and flip data-disabled once the form is valid
+    snapshot = probe_dom(driver, CONFIRM_BUTTON_QUERY)[0]
+    return clickable(snapshot) if snapshot and snapshot['attributes']['data-disabled'] == 'false' else False
+
+def wallet_confirmation_steps(prefix:str, popup_timeout:float=60)->list:
+    # Confirm button that enables itself, then the OKX popup, then the success modal on the site
+    return [
+        Step(f'{prefix}_confirm_button', action='click', condition=enabled_confirm_button, timeout=60, legacy_sleep=2,
+             opens_wallet=True),
+        Step(f'{prefix}_wallet_popup', action='switch_window', wait='wallet_popup', timeout=popup_timeout),
+        Step(f'{prefix}_wallet_confirm', (By.XPATH, "//button[.//div[text()='Confirm']]"), 'click', timeout=60, legacy_sleep=2),
+        Step(f'{prefix}_result', (By.XPATH, "//div[contains(text(), 'Transfer Successful!')]"), wait='present',
+             window='original', timeout=120),
+        Step(f'{prefix}_result_close', (By.CLASS_NAME, 'react-responsive-modal-closeButton'), 'click', timeout=60, legacy_sleep=2),
+    ]
+
+TASK5_STEPS = [
+    Step('nft_item', (By.XPATH, "//div[contains(text(), 'Co-Testnet Wave III')]"), wait='present', timeout=60),
+    # the Mint button sits under the 3rd parent of the collection title
+    Step('mint_button', action='click', timeout=60, legacy_sleep=2,
+         wait=lambda results: probe_clickable((By.XPATH, "ancestor::*[3]//button[.//div[text()='Mint']]"), root=results['nft_item'])),
+] + wallet_confirmation_steps('mint')
+
+TASK6_STEPS = [
+    Step('check_in_button', (By.XPATH, "//button[.//span[text()='Check-in']]"), 'js_click', timeout=60, legacy_sleep=2),
+] + wallet_confirmation_steps('check_in', popup_timeout=120)
 
-            if not swap_send_button_clicked:
-                logger.error('swap_send button not found or failed to click')
-                return "swap_send button not found or failed to click"
-        except:
-            logger.exception('Error clicking swap_send button')
-            return "Error clicking swap_send button"
-        
-        # Solve captcha and confirm payment in OKX wallet
-        try:
-            logger.debug('Solving captcha and confirming payment in wallet')
-            # Confirm payment in wallet
-            try:
-                # Switch to the new window
-                switched_to_popup = False
-                WebDriverWait(driver, 60).until(lambda d: len(d.window_handles) > 1) 
-                driver.switch_to.window(driver.window_handles[-1])
-                switched_to_popup = True
-                
-                if not switched_to_popup:
-                    logger.error('Failed to switch to the wallet popup window')
-                    logger.debug('Captcha solver probably failed to solve the captcha')
-                    return "Failed to switch to the wallet popup window"
-                
-                time.sleep(2)
-                
-                # Click first confirm button
-                try:
-                    first_confirmation = False
-                    for _ in range(5): # retry stale element
-                        time.sleep(1)
-                        try:
-                            first_confirmation_button = WebDriverWait(driver, 20).until(
-                                EC.presence_of_element_located((By.CLASS_NAME, 'btn-fill-highlight'))
-                            )
-                            first_confirmation_button.click()
-                            logger.debug('first confirm button click')
-                            first_confirmation = True
-                            return 0
-                        except sException.TimeoutException:
-                            logger.debug('Timeout clicking first confirm button')
-                        except:
-                            logger.exception('Exception clicking first confirm button')
-                    if not first_confirmation:
-                        logger.error('First confirm button not found or failed to click')
-                        return "First confirm button not found or failed to click"
-                except:
-                    logger.exception('Error clicking first confirm button')
-                    return "Error clicking first confirm button"
-            except:
-                logger.exception('Error confirming payment in wallet')
-                return "Error confirming payment in wallet"
-        except:
-            logger.exception('Error in captcha solver')
-            return "Error in captcha solver"
-        finally:
-            # Switch back to the original window
-            driver.switch_to.window(original_window)
-    
-    for i in range(3):
-        task3_intermediate_result = task3_intermediate()
-        if task3_intermediate_result == 0:
-            break
-        elif i == 2:
-            return task3_intermediate_result
-        else:
-            driver.get('https://pioneer.particle.network/en/point')
-    # Switch to iframe wallet
-    try:
-        for _ in range(5): # retry stale element
-            time.sleep(1)
-            try:
-                iframe = WebDriverWait(driver, 20).until(
-                    EC.frame_to_be_available_and_switch_to_it((By.CSS_SELECTOR, 'iframe'))
-                    )
-                logger.info('Switched to IFrame wallet')
-                break
-            except sException.TimeoutException:
-                logger.debug('Timeout switching to iframe wallet')
-    except:
-        logger.exception('Error switching to iframe wallet')
-        return "Error switching to iframe wallet"
-        
-    # Wait for transaction success
+def task5(driver:webdriver.Chrome, logger:logging.Logger):
     try:
-        logger.debug('Waiting for transaction confirmation')
-        for _ in range(5): # retry stale element
-            time.sleep(1)
-            try:
-                div = WebDriverWait(driver, 20).until(
-                    EC.presence_of_element_located((By.CLASS_NAME, 'transaction-result-container'))
-                    )
-                if 'view on block explorer' in div.text.lower():
-                    logger.info('Transaction success')
-                    time.sleep(2)
-                    break
-                else:
-                    logger.debug('Waiting for transaction confirmation')
-            except sException.TimeoutException:
-                logger.debug('Timeout waiting for transaction confirmation')
-            except sException.StaleElementReferenceException:
-                logger.debug('StaleElement waiting for transaction confirmation')
+        driver.get(f'{SITE_URL}/en/nft')
     except:
-        logger.exception('Error waiting for transaction confirmation')
-        return "Error waiting for transaction confirmation"
+        logger.exception('Error opening nft page')
+        return TaskFailure("Error opening nft page", FailureKind.SITE_DOWN)
+    return run_steps(driver, logger, TASK5_STEPS)
 
-    # Click cross button
-    try:
-        logger.debug('Clicking cross button')
-        for _ in range(5): # retry stale element 
-            try:
-                cross_button_presence = WebDriverWait(driver, 20).until(
-                        EC.element_to_be_clickable((By.CLASS_NAME, 'ant-drawer-open'))
-                        )
-                cross_button = cross_button_presence.find_element(By.CLASS_NAME, 'ant-drawer-extra')
-                cross_button.click()
-                break
-            except sException.StaleElementReferenceException:
-                logger.debug('StaleElement cross popup button')
-            except sException.TimeoutException:
-                logger.debug('Timeout Clicking cross button')
-    except:
-        logger.exception('Error Clicking cross button')
-        return "Error Clicking cross button"
-    finally:
-        # Switch back to the main content
-        driver.switch_to.default_content()
-    
-    # Close iframe wallet
+def task6(driver:webdriver.Chrome, logger:logging.Logger):
     try:
-        logger.debug('Closing wallet popup')
-        for _ in range(5): # retry stale element 
-            try:
-                close_popup_button = WebDriverWait(driver, 20).until(
-                    EC.element_to_be_clickable((By.CLASS_NAME, 'particle-pwe-btn'))
-                    )
-                close_popup_button.click()
-                # TASK3 SUCCESS
-                return 0
-            except sException.StaleElementReferenceException:
-                logger.debug('StaleElement close popup button')
-            except sException.TimeoutException:
-                logger.debug('Timeout closing wallet popup')
+        driver.get(f'{SITE_URL}/en/point')
     except:
-        logger.exception('Error closing wallet popup')
-        return "Error closing wallet popup"
-
-def task4(driver:webdriver.Chrome, logger:logging.Logger):
-    original_window = driver.current_window_handle
-
-    # Click Purchase NFT button
-    try:
-        logger.debug('Clicking Purchase NFT button')
-        purchase_nft__button_clicked = False
-        for _ in range(5): # retry stale element
-            time.sleep(1)
-            try:
-                purchase_nft__button_text = 'Purchase NFT'
-                purchase_nft__button = WebDriverWait(driver, 5).until(
-                    EC.element_to_be_clickable((By.XPATH, f"//button[.//span[text()='{purchase_nft__button_text}']]"))
-                )
-                driver.execute_script("arguments[0].scrollIntoView(true);", purchase_nft__button)
-                time.sleep(0.5)
-
-                if purchase_nft__button:
-                    logger.debug('purchase_nft__button found')
+        logger.exception('Error opening point page')
+        return TaskFailure("Error opening point page", FailureKind.SITE_DOWN)
+    return run_steps(driver, logger, TASK6_STEPS)
+
+class ProgressStore:
+    """Successful task runs per profile, kept in progress.db so a rerun only does the remaining work.
+
+    Runs are counted under a run key: PROGRESS_KEY from .env, or else the active run kept in
+    progress.db, so a run that is stopped and started again, also after midnight, goes on with
+    the same batch until `new_run` is called. Daily tasks such as the check-in are counted per
+    day within the run, so they are due again on the next day.
+    """
+    def __init__(self, path:str, run_key:str=None):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = None
+        self.key = run_key
+
+    @property
+    def run_key(self)->str:
+        # looked up on first use, so importing the module does not create progress.db
+        if self.key is None:
+            self.key = self.active_run()
+        return self.key
+
+    def connection(self)->sqlite3.Connection:
+        if self.conn is None:
+            self.conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.execute("""CREATE TABLE IF NOT EXISTS progress (
+                run_key TEXT, profile_id TEXT, task TEXT, runs INTEGER NOT NULL, updated_at REAL NOT NULL,
+                PRIMARY KEY (run_key, profile_id, task))""")
+            self.conn.execute('CREATE TABLE IF NOT EXISTS runs (run_key TEXT PRIMARY KEY, started_at REAL NOT NULL)')
+        return self.conn
+
+    def active_run(self)->str:
+        with self.lock:
+            conn = self.connection()
+            row = conn.execute('SELECT run_key FROM runs ORDER BY rowid DESC LIMIT 1').fetchone()
+            if row:
+                return row[0]
+            # progress.db from before runs were kept: go on with the run it was last counting
+            row = conn.execute('SELECT run_key FROM progress ORDER BY updated_at DESC LIMIT 1').fetchone()
+            run_key = row[0] if row else datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
+            conn.execute('INSERT OR REPLACE INTO runs VALUES (?, ?)', (run_key, time.time()))
+        return run_key
+
+    def new_run(self)->str:
+        run_key = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
+        with self.lock:
+            self.connection().execute('INSERT OR REPLACE INTO runs VALUES (?, ?)', (run_key, time.time()))
+        self.key = run_key
+        return run_key
+
+    def task_key(self, task:str)->str:
+        return f'{self.run_key}/{datetime.now():%Y-%m-%d}' if task in DAILY_TASKS else self.run_key
+
+    def done(self, profile_id:str, task:str)->int:
+        with self.lock:
+            row = self.connection().execute(
+                'SELECT runs FROM progress WHERE run_key=? AND profile_id=? AND task=?',
+                (self.task_key(task), profile_id, task)).fetchone()
+        return row[0] if row else 0
+
+    def record(self, profile_id:str, task:str):
+        with self.lock:
+            self.connection().execute(
+                """INSERT INTO progress VALUES (?, ?, ?, 1, ?)
+                ON CONFLICT (run_key, profile_id, task) DO UPDATE SET runs=runs+1, updated_at=excluded.updated_at""",
+                (self.task_key(task), profile_id, task, time.time()))
+
+progress = ProgressStore(progress_db_path, CONFIG.get('PROGRESS_KEY'))
+
+# successful runs each task needs per profile
+TASK_RUNS = {'task2': 1, 'task3': 5, 'task4': 5, 'task5': 1, 'task6': 1}
+# tasks that are due once a day rather than once a run: the check-in
+DAILY_TASKS = {'task6'}
+
+class RetryPolicy:
+    """How often and how long a task may keep failing with one FailureKind.
+
+    After the n-th failure of the kind in a row the task waits `backoff * factor**(n-1)`
+    seconds, capped at `max_backoff`. It retries while fewer than `attempts` failures of the
+    kind have happened in the task and the current failure streak, which a successful run
+    ends, is shorter than `budget` seconds.
+    """
+    def __init__(self, attempts:int, backoff:float=0, factor:float=2, max_backoff:float=60, budget:float=None):
+        self.attempts = attempts
+        self.backoff = backoff
+        self.factor = factor
+        self.max_backoff = max_backoff
+        self.budget = budget
+
+    def delay(self, failures:int)->float:
+        return min(self.backoff * self.factor ** (failures - 1), self.max_backoff)
+
+RETRY_POLICIES = {
+    FailureKind.TRANSIENT_UI: RetryPolicy(attempts=10, backoff=1, max_backoff=15, budget=900),
+    FailureKind.WALLET_POPUP: RetryPolicy(attempts=4, backoff=5, max_backoff=30, budget=600),
+    FailureKind.SITE_DOWN: RetryPolicy(attempts=4, backoff=15, max_backoff=120, budget=420),
+    FailureKind.FATAL: RetryPolicy(attempts=0),
+}
+
+class RetryBudget:
+    """Failures of one task in one profile run, checked against RETRY_POLICIES."""
+    def __init__(self, task:str, logger:logging.Logger, policies:dict=RETRY_POLICIES):
+        self.task = task
+        self.logger = logger
+        self.policies = policies
+        self.failures = collections.Counter()
+        self.streak = collections.Counter()  # failures per kind since the last successful run
+        self.first_failure = None  # start of the current failure streak
+
+    def pause(self, seconds:float):
+        # time spent waiting on the site breaker does not count against the budget
+        if self.first_failure is not None:
+            self.first_failure += seconds
+
+    def succeeded(self):
+        # successful work between failures never counts against the budget or the backoff
+        self.streak.clear()
+        self.first_failure = None
+
+    def retry(self, result)->bool:
+        """Record a failed run; sleep the backoff and return True if the task should run again."""
+        kind = classify_failure(result)
+        policy = self.policies[kind]
+        self.failures[kind] += 1
+        self.streak[kind] += 1
+        now = time.monotonic()
+        if self.first_failure is None:
+            self.first_failure = now
+        failures = self.failures[kind]
+        if failures > policy.attempts:
+            self.logger.error(f'{self.task}: giving up after {failures} {kind.value} failure(s)')
+            return False
+        delay = policy.delay(self.streak[kind])
+        if policy.budget is not None and now + delay - self.first_failure > policy.budget:
+            self.logger.error(f'{self.task}: {kind.value} retry budget of {policy.budget:.0f}s used up')
+            return False
+        if delay:
+            self.logger.debug(f'{self.task}: {kind.value} failure {failures}/{policy.attempts}, retrying in {delay:.0f}s')
+            time.sleep(delay)
+        return True
+
+def remaining_work(profile)->dict:
+    remaining = {}
+    for task, runs in TASK_RUNS.items():
+        if CONFIG[f'SHOULD_RUN_{task.upper()}'].lower().strip() == 'yes':
+            done = progress.done(profile['integer_id'], task)
+            if done < runs:
+                remaining[task] = runs - done
+    return remaining
+
+def launch_profile(profile, logger:logging.Logger, remaining:dict=None):
+    # Returns a ready driver, or the failure to report for the profile
+    logger.info(f'Opening Browser Profile: {profile["integer_id"]}')
+    if remaining is None:
+        remaining = remaining_work(profile)
+    capture_network = not NETWORK_CAPTURE_TASKS.isdisjoint(remaining)
+    with spans.span(logger, 'open_browser_profile') as span:
+        user_id = adspower_pool.place(profile, logger)
+        driver = open_browser_profile(user_id, logger, capture_network) if user_id else None
+        if not isinstance(driver, webdriver.Chrome):
+            span['outcome'] = 'failed'
+    if not isinstance(driver, webdriver.Chrome):
+        logger.debug('Failed to open browser')
+        return "Failed to open browser"
+    with spans.span(logger, 'browser_warmup') as span:
+        if not wait_for_browser_ready(driver, profile['alphanumeric_id'], logger):
+            span['outcome'] = 'failed'
+            return "OKX extension not ready"
+    return driver
+
+class SiteBreaker:
+    """Circuit breaker over the step outcomes of every worker.
+
+    Each step keeps its outcomes from the last `window` seconds. Once a step has failed at
+    least `min_failures` times, for `min_profiles` different profiles and in at least
+    `failure_rate` of its runs, the breaker opens and workers block at their next
+    `safe_point`. After the cooldown one worker goes through as the canary: its task
+    succeeding closes the breaker and releases everyone, a failure reopens it with the
+    cooldown doubled up to `max_cooldown`.
+    """
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, failure_rate:float=0.8, min_failures:int=6, min_profiles:int=2, window:float=300,
+                 cooldown:float=60, max_cooldown:float=600):
+        self.failure_rate = failure_rate
+        self.min_failures = min_failures
+        self.min_profiles = min_profiles
+        self.window = window
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.state = self.CLOSED
+        self.outcomes = {}  # step name -> deque of (time, ok, profile logger name)
+        self.opened_at = 0
+        self.current_cooldown = cooldown
+        self.canary = None  # thread running the canary task while half-open
+        self.trips = 0
+        self.condition = threading.Condition()
+
+    def record(self, step:str, ok:bool, source:str):
+        with self.condition:
+            # while open, only the canary's task outcome decides
+            if self.state != self.CLOSED:
+                return
+            now = time.monotonic()
+            outcomes = self.outcomes.setdefault(step, collections.deque(maxlen=200))
+            outcomes.append((now, ok, source))
+            if ok:
+                return
+            while now - outcomes[0][0] > self.window:
+                outcomes.popleft()
+            failed = [profile for _, step_ok, profile in outcomes if not step_ok]
+            if (len(failed) >= self.min_failures and len(set(failed)) >= self.min_profiles
+                    and len(failed) >= self.failure_rate * len(outcomes)):
+                self.trips += 1
+                self.state = self.OPEN
+                self.opened_at = now
+                self.outcomes.clear()
+                logger.error(f'Site breaker open: {step} failed {len(failed)}/{len(outcomes)} times '
+                             f'across {len(set(failed))} profiles, pausing workers for {self.current_cooldown:.0f}s')
+
+    def wait_turn(self, logger:logging.Logger)->float:
+        """Block while the breaker is open; return the seconds spent paused."""
+        started = time.monotonic()
+        with self.condition:
+            if self.state != self.CLOSED:
+                logger.info('Site breaker open, pausing')
+            while True:
+                if self.state == self.CLOSED:
+                    return time.monotonic() - started
+                if self.state == self.OPEN:
+                    remaining = self.opened_at + self.current_cooldown - time.monotonic()
+                    if remaining <= 0:
+                        self.state = self.HALF_OPEN
+                        self.canary = threading.get_ident()
+                        logger.info('Site breaker half-open, running this task as the canary')
+                        return time.monotonic() - started
+                    self.condition.wait(remaining)
                 else:
-                    logger.debug('purchase_nft__button missing')
-                purchase_nft__button.click()
-                logger.debug('purchase_nft__button clicked')
-                purchase_nft__button_clicked = True
-                break
-            except sException.TimeoutException:
-                logger.debug('Timeout clicking open wallet button')
-            except:
-                logger.exception('Exception clicking open wallet button')
-
-        if not purchase_nft__button_clicked:
-            logger.error('purchase_nft__button not found or failed to click')
-            return "purchase_nft__button not found or failed to click"
-    except:
-        logger.exception('Error clicking purchase_nft__button')
-        return "Error clicking purchase_nft__button"
-
-    def task4_intermediate_steps():
-        # Click Purchase button
-        try:
-            logger.debug('Clicking Purchase button')
-            purchase__button_clicked = False
-            for _ in range(5): # retry stale element
-                time.sleep(1)
-                try:
-                    purchase__button_text = 'Purchase'
-                    purchase__button = WebDriverWait(driver, 5).until(
-                        EC.element_to_be_clickable((By.XPATH, f"//button[.//span[text()='{purchase__button_text}']]"))
-                    )
-                    driver.execute_script("arguments[0].scrollIntoView(true);", purchase__button)
-                    time.sleep(2)
-
-                    if purchase__button:
-                        logger.debug('purchase__button found')
-                    else:
-                        logger.debug('purchase__button missing')
-                    purchase__button.click()
-                    logger.debug('purchase__button clicked')
-                    purchase__button_clicked = True
-                    break
-                except sException.TimeoutException:
-                    logger.debug('Timeout clicking open wallet button')
-                except:
-                    logger.exception('Exception clicking open wallet button')
-
-            if not purchase__button_clicked:
-                logger.error('purchase__button not found or failed to click')
-                return "purchase__button not found or failed to click"
-        except:
-            logger.exception('Error clicking purchase__button')
-            return "Error clicking purchase__button"
-        
-        # Select USDG Token
-        try:
-            logger.debug('Clicking USDG token button')
-            usdg_token_button_clicked = False
-            for _ in range(5): # retry stale element
-                time.sleep(1)
-                try:
-                    usdg_token_button_text = 'usdg'
-                    usdg_token_button = WebDriverWait(driver, 5).until(
-                        EC.element_to_be_clickable((By.XPATH, f"//div[text()='{usdg_token_button_text}']"))
-                    )
-                    time.sleep(2)
-
-                    if usdg_token_button:
-                        logger.debug('usdg_token_button found')
-                    else:
-                        logger.debug('usdg_token_button missing')
-                    usdg_token_button.click()
-                    logger.debug('usdg_token_button clicked')
-                    usdg_token_button_clicked = True
-                    break
-                except sException.TimeoutException:
-                    logger.debug('Timeout clicking usdg token button')
-                except:
-                    logger.exception('Exception clicking usdg token button')
-
-            if not usdg_token_button_clicked:
-                logger.error('usdg_token_button not found or failed to click')
-                return "usdg_token_button not found or failed to click"
-        except:
-            logger.exception('Error clicking usdg_token_button')
-            return "Error clicking usdg_token_button"
-        
-        # Click Next button
-        try:
-            logger.debug('Clicking Next button')
-            next_button_clicked = False
-            for _ in range(5): # retry stale element
-                time.sleep(1)
-                try:
-                    next_button_text = 'Next'
-                    next_button = WebDriverWait(driver, 5).until(
-                        EC.element_to_be_clickable((By.XPATH, f"//button[.//span[text()='{next_button_text}']]"))
-                    )
-                    time.sleep(2)
-
-                    if next_button:
-                        logger.debug('next_button found')
-                    else:
-                        logger.debug('next_button missing')
-                    next_button.click()
-                    logger.debug('next_button clicked')
-                    next_button_clicked = True
-                    break
-                except sException.TimeoutException:
-                    logger.debug('Timeout clicking next button')
-                except:
-                    logger.exception('Exception clicking next button')
-
-            if not next_button_clicked:
-                logger.error('next_button not found or failed to click')
-                return "next_button not found or failed to click"
-        except:
-            logger.exception('Error clicking next_button')
-            return "Error clicking next_button"
-
-        time.sleep(5)
-        # Click Purchase2 button
-        try:
-            logger.debug('Clicking Purchase button (2)')
-            purchase2_button_clicked = False
-            for _ in range(5): # retry stale element
-                time.sleep(1)
-                try:
-                    purchase2_button_text = 'Purchase'
-                    purchase2_button = WebDriverWait(driver, 5).until(
-                        EC.element_to_be_clickable((By.XPATH, f"//div[@class='react-responsive-modal-modal']//button[.//span[text()='{purchase2_button_text}']]")) #f"//div[.//span[text()='{purchase2_button_text}']]"))
-                    )
-                    # driver.execute_script("arguments[0].scrollIntoView(true);", purchase2_button)
-                    time.sleep(5)
-
-                    if purchase2_button:
-                        logger.debug('purchase2_button found')
-                    else:
-                        logger.debug('purchase2_button missing')
-                    purchase2_button.click()
-                    logger.debug('purchase2_button clicked')
-                    purchase2_button_clicked = True
-                    return 0
-                except sException.TimeoutException:
-                    logger.debug('Timeout clicking purchase2_button')
-                except sException.ElementClickInterceptedException as e:
-                    logger.debug(f'Click intercepted, retrying...')
-                    time.sleep(1)
-                except:
-                    logger.exception('Exception clicking purchase2_button')
-
-            if not purchase2_button_clicked:
-                logger.error('purchase2_button not found or failed to click')
-                return "purchase2_button not found or failed to click"
-        except:
-            logger.exception('Error clicking purchase2_button')
-            return "Error clicking purchase2_button"
-
-    intermediate_result = task4_intermediate_steps()
-    for i in range(3):
-        if intermediate_result == 0:
-            break
-        elif i == 2:
-            return 'Failed please check the logs'
-        else:
-            driver.refresh()
+                    self.condition.wait()
 
-    # After clicking Purchase2 button we get a captcha before redirecting to wallet confirmation
-
-    # Confirm payment in OKX wallet
-    try:
-        logger.debug('Confirming payment in wallet')
+    def task_finished(self, ok:bool):
+        # no-op unless this thread is the canary
+        with self.condition:
+            if self.canary != threading.get_ident():
+                return
+            self.canary = None
+            if ok:
+                self.state = self.CLOSED
+                self.current_cooldown = self.cooldown
+                logger.info('Site breaker closed, canary succeeded')
+            else:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                self.current_cooldown = min(self.current_cooldown * 2, self.max_cooldown)
+                logger.error(f'Site breaker canary failed, staying open for {self.current_cooldown:.0f}s')
+            self.condition.notify_all()
+
+    @contextmanager
+    def safe_point(self, logger:logging.Logger):
+        """Pause here while the breaker is open; set ['ok'] so a canary run can close it."""
+        checkpoint = {'paused': self.wait_turn(logger), 'ok': False}
         try:
-            # Switch to the new window
-            switched_to_popup = False
-            counter = 0
-            while True:# Wait for captcha get solved and eventually new window appear
-                try:
-                    driver.find_element(By.CSS_SELECTOR , 'div[role="alert"]')
-                    logger.debug('Captcha solver failed to solve the captcha')
-                    driver.refresh()
-                    task4_intermediate_steps()
-                except:
-                    pass
-                counter +=1
-                if counter % 60 == 0:
-                    driver.refresh()
-                    task4_intermediate_steps()
-                time.sleep(1)
-                if len(driver.window_handles) > 1:
-                    driver.switch_to.window(driver.window_handles[-1])
-                    switched_to_popup = True
-                    break
-            if not switched_to_popup:
-                logger.error('Failed to switch to the wallet popup window')
-                logger.debug('Captcha solver probably failed to solve the captcha')
-                return "Failed to switch to the wallet popup window"
-            
-            time.sleep(2)
-            
-            # Click first confirm button
-            try:
-                first_confirmation = False
-                for _ in range(5): # retry stale element
-                    time.sleep(1)
-                    try:
-                        first_confirmation_button = WebDriverWait(driver, 20).until(
-                            EC.presence_of_element_located((By.CLASS_NAME, 'btn-fill-highlight'))
-                        )
-                        first_confirmation_button.click()
-                        logger.debug('first confirm button click')
-                        first_confirmation = True
-                        break
-                    except sException.TimeoutException:
-                        logger.debug('Timeout clicking first confirm button')
-                    except:
-                        logger.exception('Exception clicking first confirm button')
-                if not first_confirmation:
-                    logger.error('First confirm button not found or failed to click')
-                    return "First confirm button not found or failed to click"
-            except:
-                logger.exception('Error clicking first confirm button')
-                return "Error clicking first confirm button"
-        except:
-            logger.exception('Error confirming payment in wallet')
-            return "Error confirming payment in wallet"
-    except:
-        logger.exception('Error in captcha solver')
-        return "Error in captcha solver"
-    finally:
-        # Switch back to the original window
-        driver.switch_to.window(original_window)
-    
-    # Wait for transaction success
-    try:
-        logger.debug('Waiting for transaction confirmation')
-        for _ in range(5): # retry stale element
-            time.sleep(1)
-            try:
-                div_text = 'successfully'
-                # Wait until the element with the class "react-responsive-modal-modal" contains the text "successfully", case insensitive
-                WebDriverWait(driver, 30).until(
-                    lambda driver: div_text.lower() in driver.find_element(By.CLASS_NAME, "react-responsive-modal-modal").text.lower()
-                )
-                logger.info('Transaction success')
-                break
-            except sException.TimeoutException:
-                logger.debug('Timeout waiting for transaction confirmation')
-            except sException.StaleElementReferenceException:
-                logger.debug('StaleElement waiting for transaction confirmation')
-    except:
-        logger.exception('Error waiting for transaction confirmation')
-        return "Error waiting for transaction confirmation"
-    
-    # Close transaction confirmation popup
-    try:
-        close_button = None
-        logger.debug('Closing nft transaction confirmation popup')
-        for _ in range(5): # retry stale element
-            time.sleep(1)
-            try:
-                close_button = WebDriverWait(driver, 20).until(
-                    EC.presence_of_element_located((By.CLASS_NAME, 'react-responsive-modal-closeButton'))
-                )
-                close_button.click()
-                logger.debug('nft buy confirmation popup closed')
-                break
-            except sException.TimeoutException:
-                logger.debug('Timeout closing nft transaction confirmation popup')
-            except:
-                logger.exception('Exception closing nft transaction confirmation popup')
-        if not close_button:
-            logger.error('nft transaction confirmation popup not found or failed to click')
-            return 'nft transaction confirmation popup not found or failed to click'
-
-    except:
-        logger.exception('Error closing nft transaction confirmation popup')
-        return "Error closing nft transaction confirmation popup"
-
-    # Press Back button
-    try:
-        back_button_clicked = False
-        for _ in range(5): # retry stale element
-            time.sleep(1)
+            yield checkpoint
+        finally:
+            self.task_finished(checkpoint['ok'])
+
+site_breaker = SiteBreaker(
+    failure_rate=float(CONFIG.get('SITE_BREAKER_FAILURE_RATE') or 0.8),
+    min_failures=int(CONFIG.get('SITE_BREAKER_MIN_FAILURES') or 6),
+    cooldown=float(CONFIG.get('SITE_BREAKER_COOLDOWN_SECONDS') or 60),
+)
+
+def timed_task(logger:logging.Logger, name:str, task, *args):
+    with spans.span(logger, name) as span:
+        result = task(*args)
+        span['outcome'] = 'ok' if result == 0 else classify_failure(result).value
+    return result
+
+def run_task(driver:webdriver.Chrome, logger:logging.Logger, profile_id, name:str, task, *args, reload:bool=True):
+    """Run `task` until the profile has its TASK_RUNS successes; return 0 or the last failure.
+
+    Failures are retried as RETRY_POLICIES allows for their kind, reloading the point page
+    first when `reload` is set.
+    """
+    label = name.capitalize()
+    needed = TASK_RUNS[name]
+    successes = progress.done(profile_id, name)
+    retries = RetryBudget(name, logger)
+    while successes < needed:
+        with site_breaker.safe_point(logger) as checkpoint:
+            retries.pause(checkpoint['paused'])
+            result = timed_task(logger, name, task, driver, logger, *args)
+            checkpoint['ok'] = result == 0
+        if result == 0 or classify_failure(result) == FailureKind.SITE_DOWN:
+            site_breaker.record(name, result == 0, logger.name)
+        if result == 0:
+            logger.info(f'{label} RUN-{successes} Success')
+            successes += 1
+            progress.record(profile_id, name)
+            retries.succeeded()
+            continue
+        logger.error(f'{label} RUN-{successes} Failure ({classify_failure(result).value})')
+        if not retries.retry(result):
+            return result
+        if reload:
             try:
-                back_button_text = 'back'
-                back_button = WebDriverWait(driver, 5).until(
-                    EC.element_to_be_clickable((By.XPATH, f"//div[text()='{back_button_text}']"))
-                )
-                back_button.click()
-                back_button_clicked = True
-                logger.debug('back button clicked')
-                break
-            except sException.TimeoutException:
-                logger.debug('Timeout clicking back button')
+                driver.get(f'{SITE_URL}/en/point')
             except:
-                logger.exception('Exception in back button')
-
-        if back_button_clicked:
-            time.sleep(5) # voluntary wait for smooth transition
-            # TASK4 SUCCESS
-            return 0
-        else:
-            logger.error('Back button not found or failed to click')
-            return "Back button not found or failed to click"
-    except:
-        logger.exception('Error clicking back button')
-        return "Error clicking back button"
-
-# Function to check if okx_wallet_id is in the URL of any window handle
-def check_wallet_id_in_window_handles(driver:webdriver.Chrome, okx_wallet_id):
-    for handle in driver.window_handles:
-        driver.switch_to.window(handle)
-        current_url = driver.current_url
-        if okx_wallet_id in current_url:
-            return True
-    return False
-
-def task5(driver:webdriver.Chrome, logger:logging.Logger):
-    original_handle = driver.current_window_handle
-    try:
-        driver.get('https://pioneer.particle.network/en/nft')
-
-        # wait for div which contains text Co-Testnet Wave III and has class item
-        nft_item = WebDriverWait(driver, 60).until(
-            EC.presence_of_element_located((By.XPATH, "//div[contains(text(), 'Co-Testnet Wave III')]"))
-        )
-
-        # Navigate to the 3rd parent of the found div
-        parent_element = nft_item.find_element(By.XPATH, "ancestor::*[3]")
-
-        # logger.debug(parent_element.text)
-
-        #wait for button with text Mint
-        mint_button = WebDriverWait(parent_element, 60).until(
-            EC.element_to_be_clickable((By.XPATH, ".//button[.//div[text()='Mint']]"))
-        )
-        
-        time.sleep(2)
-        mint_button.click()
-        logger.debug('Mint button clicked')
-        # wait for button with text Confirm
-        confirm_button = WebDriverWait(driver, 60).until(
-            EC.element_to_be_clickable((By.XPATH, "//button[.//div[text()='Confirm']]"))
-        )
-        # wait for its data-disabled attribute to be false
-        WebDriverWait(driver, 60).until(lambda d: confirm_button.get_attribute('data-disabled') == 'false')
-        
-        time.sleep(2)
-        confirm_button.click()
-        logger.debug('Mint confirm button clicked')
-
-        # wait for window handle whose url contains wallet id
-        okx_wallet_id = 'mcohilncbfahbmgdjkbpemcciiolgcge'
-        WebDriverWait(driver, 60).until(lambda d: check_wallet_id_in_window_handles(d, okx_wallet_id))
-        logger.debug('Switched to wallet window')
-
-        # wait for button with text Confirm
-        confirm_button = WebDriverWait(driver, 60).until(
-            EC.element_to_be_clickable((By.XPATH, "//button[.//div[text()='Confirm']]"))
-        )
-        time.sleep(2)
-        confirm_button.click()
-        logger.debug('Wallet confirm button clicked')
-
-        # Switch back to the original window
-        driver.switch_to.window(original_handle)
-
-        # Wait up to 90 seconds for the div containing 'Successful!' text to appear
-        WebDriverWait(driver, 120).until(EC.presence_of_element_located((By.XPATH, "//div[contains(text(), 'Transfer Successful!')]")))
-        logger.debug('NFT Mint Successful!')
-        time.sleep(2)
-        close_button = WebDriverWait(driver, 60).until(
-        EC.presence_of_element_located((By.CLASS_NAME, 'react-responsive-modal-closeButton'))
-        )
-        close_button.click()
-        logger.debug('NFT Mint confirmation popup closed')
-        return 0
-    except:
-        logger.exception('Error')
-    finally:
-        driver.switch_to.window(original_handle)
-
-def task6(driver:webdriver.Chrome, logger:logging.Logger):
-    original_handle = driver.current_window_handle
-    try:
-        driver.get('https://pioneer.particle.network/en/point')
-
-        # wait for button with test Check-in
-        check_in_button = WebDriverWait(driver, 60).until(
-            EC.element_to_be_clickable((By.XPATH, "//button[.//span[text()='Check-in']]"))
-        )
-        time.sleep(2)
-        driver.execute_script("arguments[0].click();", check_in_button)
-        logger.debug('Check-in button clicked')
-
-        # wait for button with text Confirm
-        confirm_button = WebDriverWait(driver, 60).until(
-            EC.element_to_be_clickable((By.XPATH, "//button[.//div[text()='Confirm']]"))
-        )
-        # wait for its data-disabled attribute to be false
-        WebDriverWait(driver, 60).until(lambda d: confirm_button.get_attribute('data-disabled') == 'false')
-        time.sleep(2)
-        confirm_button.click()
-        logger.debug('Check-in confirm button clicked')
-
-        # wait for window handle whose url contains wallet id
-        okx_wallet_id = 'mcohilncbfahbmgdjkbpemcciiolgcge'
-        WebDriverWait(driver, 120).until(lambda d: check_wallet_id_in_window_handles(d, okx_wallet_id))
-        logger.debug('Switched to wallet window')
-
-        # wait for button with text Confirm
-        confirm_button = WebDriverWait(driver, 60).until(
-            EC.element_to_be_clickable((By.XPATH, "//button[.//div[text()='Confirm']]"))
-        )
-        time.sleep(2)
-        confirm_button.click()
-        logger.debug('Wallet confirm button clicked')
-
-        # Switch back to the original window
-        driver.switch_to.window(original_handle)
-
-        # Wait up to 90 seconds for the div containing 'Successful!' text to appear
-        WebDriverWait(driver, 120).until(EC.presence_of_element_located((By.XPATH, "//div[contains(text(), 'Transfer Successful!')]")))
-        logger.debug('Check-in Successful!')
-        time.sleep(2)
-        close_button = WebDriverWait(driver, 60).until(
-        EC.presence_of_element_located((By.CLASS_NAME, 'react-responsive-modal-closeButton'))
-        )
-        close_button.click()
-        logger.debug('Check-in Successful popup closed')
-        return 0
-    except:
-        logger.exception('Error')
-    finally:
-        driver.switch_to.window(original_handle)
+                logger.exception('Error reloading point page')
+    return 0
 
-def main(profile, logger:logging.Logger):
+def main(profile, logger:logging.Logger, launched=None):
+    # a browser prelaunched for this profile is torn down even if we return before using it
+    driver = launched
     try:
-        df_wallet_data = pd.read_excel('Particle wallets.xlsx')
-        result = df_wallet_data.loc[df_wallet_data['acc_id'] == int(profile["integer_id"]), 'wallet']
-        if not result.empty:
-            particle_wallet_address = result.iloc[0]
-        else:
+        particle_wallet_address = get_wallets().get(int(profile["integer_id"]))
+        if particle_wallet_address is None:
             logger.error("profile id not found in Particles wallets file")
             return "Failure"
-            
-        logger.info(f'Opening Browser Profile: {profile["integer_id"]}')
-        driver = open_browser_profile(profile['alphanumeric_id'], logger)
+
+        remaining = remaining_work(profile)
+        if not remaining:
+            logger.info('All tasks already completed for this profile')
+            return "SUCCESS"
+        logger.info(f'Remaining work: {remaining}')
+        profile_id = profile['integer_id']
+
+        # the browser may already have been launched by the Prelauncher
+        if driver is None:
+            driver = launch_profile(profile, logger, remaining)
         if isinstance(driver, webdriver.Chrome):
-            original_window = driver.current_window_handle
-            # if browser is not cached it shows all kinds of extention popups and welcome pages
-            logger.info('Waiting 60 seconds just in case browser is not cached already')
-            time.sleep(60)
-            # Close all other tabs/windows
-            for handle in driver.window_handles:
-                if handle != original_window:
-                    driver.switch_to.window(handle)
-                    driver.close()
-
-            # Switch back to the original window
-            driver.switch_to.window(original_window)
-
-            task1_success = task1(driver, logger)
+            with site_breaker.safe_point(logger) as checkpoint:
+                task1_success = timed_task(logger, 'task1', task1, driver, logger)
+                checkpoint['ok'] = task1_success == 0
             if task1_success==0:
                 logger.info('Task1 Success')
             else:
                 logger.error('Task1 Failure')
                 return f"Task1 Failure\n{task1_success}" 
             
-            if CONFIG['SHOULD_RUN_TASK2'].lower().strip() == 'yes':
-                max_tries = 3
-                task2_success = None
-                while max_tries > 0:
-                    max_tries -= 1
-                    task2_success = task2(driver, logger)
-                    if task2_success==0:
-                        logger.info('Task2 Success')
-                        break
-                    else:
-                        logger.error('Task2 Failure - Retrying')
-                        driver.get('https://pioneer.particle.network/en/point')
-                    
-                if not task2_success==0:
+            if 'task2' in remaining:
+                task2_success = run_task(driver, logger, profile_id, 'task2', task2)
+                if task2_success != 0:
                     return f"Task2 Failure\n{task2_success}"
 
-            # Task3 run 10 times
-            if CONFIG['SHOULD_RUN_TASK3'].lower().strip() == 'yes':
-                task3_successes_needed = 5
-                task3_successes = 0
-                max_tries = 50 #so each profile get 5 chances
-                while task3_successes < task3_successes_needed and max_tries > 0:
-                    max_tries -= 1
-                    task3_success = task3(driver, logger, particle_wallet_address)
-                    if task3_success==0:
-                        logger.info(f'Task3 RUN-{task3_successes} Success')
-                        task3_successes += 1
-                    else:
-                        logger.error(f'Task3 RUN-{task3_successes} Failure')
-                        driver.get('https://pioneer.particle.network/en/point')
-                
-                if task3_successes < task3_successes_needed:
-                    logger.error(f'Task3 Failed to execute {task3_successes_needed} times')
-                    return f"Task3 Failed to execute {task3_successes_needed} times"
-                
+            if 'task3' in remaining:
+                if run_task(driver, logger, profile_id, 'task3', task3, particle_wallet_address) != 0:
+                    logger.error(f'Task3 Failed to execute {TASK_RUNS["task3"]} times')
+                    return f"Task3 Failed to execute {TASK_RUNS['task3']} times"
+
             # voluntary wait for transaction to be reflected in wallet
-            time.sleep(10)
-
-            # Task4 run 5 times
-            if CONFIG['SHOULD_RUN_TASK4'].lower().strip() == 'yes':
-                task4_successes_needed = 5
-                task4_successes = 0
-                max_tries = 25 #so each profile get 5 chances
-                while task4_successes < task4_successes_needed and max_tries > 0:
-                    max_tries -= 1
-                    task4_success = task4(driver, logger)
-                    if task4_success==0:
-                        logger.info(f'Task4 RUN-{task4_successes} Success')
-                        task4_successes += 1
-                    else:
-                        logger.error(f'Task4 RUN-{task4_successes} Failure')
-                        driver.get('https://pioneer.particle.network/en/point')
-                
-                if task4_successes < task4_successes_needed:
-                    logger.error(f'Task4 Failed to execute {task4_successes_needed} times')
-                    return f"Task4 Failed to execute {task4_successes_needed} times"
-                
-            if CONFIG['SHOULD_RUN_TASK5'].lower().strip()=='yes':
-                task5_successes_needed = 1
-                task5_successes = 0
-                max_tries = 5
-                while task5_successes < task5_successes_needed and max_tries > 0:
-                    max_tries -= 1
-                    task5_success = task5(driver, logger)
-                    if task5_success==0:
-                        logger.info(f'Task5 RUN-{task5_successes} Success')
-                        task5_successes += 1
-                    else:
-                        logger.error(f'Task5 RUN-{task5_successes} Failure')
-                
-                if task5_successes < task5_successes_needed:
-                    logger.error(f'Task5 Failed to execute {task5_successes_needed} times')
-                    return f"Task5 Failed to execute {task5_successes_needed} times"
-            
-            if CONFIG['SHOULD_RUN_TASK6'].lower().strip()=='yes':
-                task6_successes_needed = 1
-                task6_successes = 0
-                max_tries = 5
-                while task6_successes < task6_successes_needed and max_tries > 0:
-                    max_tries -= 1
-                    task6_success = task6(driver, logger)
-                    if task6_success==0:
-                        logger.info(f'Task6 RUN-{task6_successes} Success')
-                        task6_successes += 1
-                    else:
-                        logger.error(f'Task6 RUN-{task6_successes} Failure')
-                
-                if task6_successes < task6_successes_needed:
-                    logger.error(f'Task6 Failed to execute {task6_successes_needed} times')
-                    return f"Task6 Failed to execute {task6_successes_needed} times"
+            time.sleep(BALANCE_SETTLE_SECONDS)
+
+            if 'task4' in remaining:
+                if run_task(driver, logger, profile_id, 'task4', task4) != 0:
+                    logger.error(f'Task4 Failed to execute {TASK_RUNS["task4"]} times')
+                    return f"Task4 Failed to execute {TASK_RUNS['task4']} times"
+
+            if 'task5' in remaining:
+                if run_task(driver, logger, profile_id, 'task5', task5, reload=False) != 0:
+                    logger.error(f'Task5 Failed to execute {TASK_RUNS["task5"]} times')
+                    return f"Task5 Failed to execute {TASK_RUNS['task5']} times"
+
+            if 'task6' in remaining:
+                if run_task(driver, logger, profile_id, 'task6', task6, reload=False) != 0:
+                    logger.error(f'Task6 Failed to execute {TASK_RUNS["task6"]} times')
+                    return f"Task6 Failed to execute {TASK_RUNS['task6']} times"
         else:
-            logger.debug('Failed to open browser')
-            return "Failed to open browser"        
+            return driver
         return "SUCCESS"
     
     except Exception as e:
         logger.exception('Exception occurred')
         return str(e)
     finally:
-        close_browser_profile(profile['alphanumeric_id'], driver, logger)
-
-def run_profile(profile):
+        if isinstance(driver, CountingChrome):
+            logger.info(f'WebDriver round trips: {driver.round_trips}')
+            spans.add_round_trips(driver.round_trips)
+        # driver stays None when nothing had to be launched
+        if driver is not None:
+            close_browser_profile(profile['alphanumeric_id'], driver, logger, profile['integer_id'])
+
+def start_profile_logger(profile)->logging.Logger:
     log_file = os.path.join(logs_dir, f"{profile['integer_id']}.log")
     
     # Set up a custom logger for this specific profile run
     custom_logger = setup_logger(log_file)
+    spans.start_profile(custom_logger, profile['integer_id'])
     
     custom_logger.info(f'Starting run for profile: {profile["integer_id"]}')
-    result = main(profile, custom_logger)
-    custom_logger.info(f'Completed run for profile: {profile["integer_id"]} with result: {result}')
+    return custom_logger
+
+def run_profile(profile, custom_logger:logging.Logger=None, launched=None):
+    if custom_logger is None:
+        custom_logger = start_profile_logger(profile)
+    try:
+        result = main(profile, custom_logger, launched)
+        custom_logger.info(f'Completed run for profile: {profile["integer_id"]} with result: {result}')
+    finally:
+        profile_logs.close(custom_logger)
     
-    return {"Profile ID": profile['integer_id'], "Result": result}
+    return {"Profile ID": profile['integer_id'], "Result": result, "Steps": spans.pop_profile(custom_logger)}
+
+
+class ReportWriter:
+    """Appends each profile's result to the report as soon as it completes.
+
+    A single thread owns the files: every row is flushed so the CSV can be tailed during
+    the run, and both files are fsynced every `fsync_every` rows or `fsync_interval`
+    seconds. Step timings go to a JSONL file next to the CSV.
+    """
+    fieldnames = ['Profile ID', 'Result']
+
+    def __init__(self, csv_path:str, fsync_every:int=10, fsync_interval:float=30):
+        self.csv_path = csv_path
+        self.steps_path = os.path.splitext(csv_path)[0] + '.steps.jsonl'
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._run, name='report-writer')
+
+    def start(self):
+        self.csv_file = open(self.csv_path, mode='w', newline='')
+        self.steps_file = open(self.steps_path, mode='w')
+        self.writer = csv.DictWriter(self.csv_file, fieldnames=self.fieldnames)
+        self.writer.writeheader()
+        self.csv_file.flush()
+        self.thread.start()
+
+    def write(self, row:dict):
+        self.queue.put(row)
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+
+    def fsync(self):
+        for file in (self.csv_file, self.steps_file):
+            file.flush()
+            os.fsync(file.fileno())
+
+    def _run(self):
+        unsynced = 0
+        last_sync = time.monotonic()
+        try:
+            while True:
+                try:
+                    row = self.queue.get(timeout=self.fsync_interval)
+                except queue.Empty:
+                    row = False
+                if row is None:
+                    break
+                if row:
+                    steps = row.pop('Steps', [])
+                    self.writer.writerow(row)
+                    self.csv_file.flush()
+                    self.steps_file.write(json.dumps({**row, 'Steps': steps}) + '\n')
+                    self.steps_file.flush()
+                    unsynced += 1
+                if unsynced and (unsynced >= self.fsync_every or time.monotonic() - last_sync >= self.fsync_interval):
+                    self.fsync()
+                    unsynced = 0
+                    last_sync = time.monotonic()
+        except:
+            logger.exception('Error writing report')
+        finally:
+            self.fsync()
+            self.csv_file.close()
+            self.steps_file.close()
+
+class JobQueue:
+    """Profiles to run, kept in jobs.db so a run can be stopped, restarted or extended.
+
+    Workers lease the queued job with the highest priority. A process keeps its leases alive
+    with `heartbeat`; leases that are not renewed for `lease_seconds` (a crashed or killed
+    run) go back to the queue. Jobs are kept under the run key of `progress` and can be
+    added, cancelled and re-prioritised from another process with `BOT jobs ...`.
+    """
+    def __init__(self, path:str, progress:ProgressStore, lease_seconds:float=300):
+        self.path = path
+        self.progress = progress
+        self.lease_seconds = lease_seconds
+        self.worker = f'{socket.gethostname()}-{os.getpid()}'
+        self.lock = threading.Lock()
+        self.conn = None
+
+    @property
+    def run_key(self)->str:
+        return self.progress.run_key
+
+    def connection(self)->sqlite3.Connection:
+        if self.conn is None:
+            self.conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.execute("""CREATE TABLE IF NOT EXISTS jobs (
+                run_key TEXT, profile_id TEXT, alphanumeric_id TEXT NOT NULL, priority INTEGER NOT NULL DEFAULT 0,
+                state TEXT NOT NULL, worker TEXT, lease_expires REAL, leases INTEGER NOT NULL DEFAULT 0,
+                result TEXT, created_at REAL NOT NULL, updated_at REAL NOT NULL, rejected_by TEXT NOT NULL DEFAULT '',
+                PRIMARY KEY (run_key, profile_id))""")
+            columns = [row[1] for row in self.conn.execute('PRAGMA table_info(jobs)')]
+            if 'rejected_by' not in columns:
+                self.conn.execute("ALTER TABLE jobs ADD COLUMN rejected_by TEXT NOT NULL DEFAULT ''")
+        return self.conn
+
+    @contextmanager
+    def transaction(self):
+        # BEGIN IMMEDIATE takes the write lock up front, so two processes never lease the same job
+        with self.lock:
+            conn = self.connection()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield conn
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+
+    def add(self, profiles:list, priority:int=0)->int:
+        """Queue `profiles`; jobs that were cancelled or finished without success are queued again."""
+        now = time.time()
+        added = 0
+        with self.transaction() as conn:
+            for profile in profiles:
+                added += conn.execute(
+                    """INSERT INTO jobs (run_key, profile_id, alphanumeric_id, priority, state, created_at, updated_at)
+                    VALUES (?, ?, ?, ?, 'queued', ?, ?)
+                    ON CONFLICT (run_key, profile_id) DO UPDATE SET
+                        state='queued', alphanumeric_id=excluded.alphanumeric_id, priority=excluded.priority, result=NULL,
+                        worker=NULL, lease_expires=NULL, rejected_by='', updated_at=excluded.updated_at
+                    WHERE state='cancelled' OR (state='done' AND result IS NOT 'SUCCESS')""",
+                    (self.run_key, profile['integer_id'], profile['alphanumeric_id'], priority, now, now)).rowcount
+        return added
+
+    def lease(self, worker:str=None)->dict:
+        """Lease the next job for this process, or for `worker`; None when nothing is queued."""
+        worker = worker or self.worker
+        now = time.time()
+        with self.transaction() as conn:
+            expired = conn.execute(
+                """UPDATE jobs SET state='queued', worker=NULL, lease_expires=NULL, updated_at=?
+                WHERE run_key=? AND state='leased' AND lease_expires < ?""", (now, self.run_key, now)).rowcount
+            if expired:
+                logger.warning(f'{expired} expired job lease(s) returned to the queue')
+            row = conn.execute(
+                """SELECT profile_id, alphanumeric_id FROM jobs WHERE run_key=? AND state='queued'
+                AND instr(',' || rejected_by || ',', ',' || ? || ',') = 0
+                ORDER BY priority DESC, created_at, rowid LIMIT 1""", (self.run_key, worker)).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                """UPDATE jobs SET state='leased', worker=?, lease_expires=?, leases=leases+1, updated_at=?
+                WHERE run_key=? AND profile_id=?""", (worker, now + self.lease_seconds, now, self.run_key, row[0]))
+        return {'integer_id': row[0], 'alphanumeric_id': row[1]}
+
+    def next(self, stopped:threading.Event, poll_interval:float=2)->dict:
+        """Block until a job can be leased; None once nothing is queued or leased, or when `stopped` is set."""
+        while not stopped.is_set():
+            job = self.lease()
+            if job is not None:
+                return job
+            counts = self.counts()
+            if not counts.get('queued') and not counts.get('leased'):
+                return None
+            # jobs still leased may come back (crashed worker) and more may be added meanwhile
+            stopped.wait(poll_interval)
+        return None
+
+    def heartbeat(self, worker:str=None):
+        now = time.time()
+        with self.transaction() as conn:
+            conn.execute("UPDATE jobs SET lease_expires=? WHERE run_key=? AND state='leased' AND worker=?",
+                         (now + self.lease_seconds, self.run_key, worker or self.worker))
+
+    def complete(self, profile_id:str, row:dict, worker:str=None):
+        # `row` is the profile's report row
+        with self.transaction() as conn:
+            conn.execute(
+                """UPDATE jobs SET state='done', result=?, worker=NULL, lease_expires=NULL, updated_at=?
+                WHERE run_key=? AND profile_id=? AND state='leased' AND worker=?""",
+                (str(row['Result']), time.time(), self.run_key, profile_id, worker or self.worker))
+
+    def release(self, worker:str=None)->int:
+        # hand this process's unfinished jobs back, e.g. prelaunched profiles that never ran
+        with self.transaction() as conn:
+            return conn.execute(
+                """UPDATE jobs SET state='queued', worker=NULL, lease_expires=NULL, updated_at=?
+                WHERE run_key=? AND state='leased' AND worker=?""",
+                (time.time(), self.run_key, worker or self.worker)).rowcount
+
+    def reject(self, profile_id:str, worker:str):
+        # queue a job `worker` cannot run again for the other workers; finish_rejected ends it
+        with self.transaction() as conn:
+            row = conn.execute("SELECT rejected_by FROM jobs WHERE run_key=? AND profile_id=? AND state='leased' AND worker=?",
+                               (self.run_key, profile_id, worker)).fetchone()
+            if row is None:
+                return
+            rejected_by = set(filter(None, row[0].split(','))) | {worker}
+            conn.execute(
+                """UPDATE jobs SET state='queued', worker=NULL, lease_expires=NULL, rejected_by=?, updated_at=?
+                WHERE run_key=? AND profile_id=?""",
+                (','.join(sorted(rejected_by)), time.time(), self.run_key, profile_id))
+
+    def finish_rejected(self, workers:set, drained_only:bool=False)->list:
+        """Finish the queued jobs every worker in `workers` has rejected; returns their profile ids.
+
+        With `drained_only` nothing is finished while any other job is still queued or leased.
+        """
+        if not workers:
+            return []
+        with self.transaction() as conn:
+            rows = conn.execute("SELECT profile_id, state, rejected_by FROM jobs WHERE run_key=? AND state IN ('queued', 'leased')",
+                                (self.run_key,)).fetchall()
+            rejected = [profile_id for profile_id, state, rejected_by in rows
+                        if state == 'queued' and workers <= set(filter(None, rejected_by.split(',')))]
+            if not rejected or (drained_only and len(rejected) < len(rows)):
+                return []
+            now = time.time()
+            conn.executemany(
+                """UPDATE jobs SET state='done', result='Profile not found in AdsPower', updated_at=?
+                WHERE run_key=? AND profile_id=?""", [(now, self.run_key, profile_id) for profile_id in rejected])
+        return rejected
+
+    def cancel(self, profile_ids:list)->int:
+        # only queued jobs; a profile that is already running is not interrupted
+        with self.transaction() as conn:
+            return sum(conn.execute(
+                """UPDATE jobs SET state='cancelled', updated_at=? WHERE run_key=? AND profile_id=? AND state='queued'""",
+                (time.time(), self.run_key, profile_id)).rowcount for profile_id in profile_ids)
+
+    def set_priority(self, profile_ids:list, priority:int)->int:
+        with self.transaction() as conn:
+            return sum(conn.execute(
+                'UPDATE jobs SET priority=?, updated_at=? WHERE run_key=? AND profile_id=?',
+                (priority, time.time(), self.run_key, profile_id)).rowcount for profile_id in profile_ids)
+
+    def counts(self)->dict:
+        with self.lock:
+            rows = self.connection().execute(
+                'SELECT state, COUNT(*) FROM jobs WHERE run_key=? GROUP BY state', (self.run_key,)).fetchall()
+        return dict(rows)
+
+    def finished(self)->bool:
+        """Whether every job of the run succeeded, was cancelled or had no profile in AdsPower.
+
+        A job that failed keeps the run open: its profile is queued again on the next start
+        and goes on from the progress it already made.
+        """
+        with self.lock:
+            total, closed = self.connection().execute(
+                """SELECT COUNT(*), COALESCE(SUM(state='cancelled' OR (state='done' AND result IN
+                ('SUCCESS', 'Profile not found in AdsPower'))), 0) FROM jobs WHERE run_key=?""", (self.run_key,)).fetchone()
+        return total > 0 and total == closed
+
+    def jobs(self)->list:
+        with self.lock:
+            return self.connection().execute(
+                """SELECT profile_id, state, priority, leases, worker, result FROM jobs WHERE run_key=?
+                ORDER BY state, priority DESC, created_at""", (self.run_key,)).fetchall()
+
+jobs = JobQueue(jobs_db_path, progress, lease_seconds=float(CONFIG.get('JOB_LEASE_SECONDS') or 300))
+
+def start_run():
+    # a finished batch makes way for a new run; an unfinished one is resumed whatever the date
+    if not CONFIG.get('PROGRESS_KEY') and jobs.finished():
+        logger.info(f'Previous run finished, starting run {progress.new_run()}')
+
+class JobHeartbeat:
+    # renews every lease this process holds, so a hung or killed process loses its jobs after one lease
+    def __init__(self, queue:JobQueue):
+        self.queue = queue
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, name='job-heartbeat', daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+    def _run(self):
+        while not self.stopped.wait(self.queue.lease_seconds / 3):
+            try:
+                self.queue.heartbeat()
+            except:
+                logger.exception('Error renewing job leases')
+
+def jobs_command(argv:list):
+    """`BOT jobs add|cancel|priority|list|new-run`: change the queue of a running or stopped run."""
+    import argparse
+    parser = argparse.ArgumentParser(prog='BOT jobs')
+    commands = parser.add_subparsers(dest='command', required=True)
+    add = commands.add_parser('add', help='queue profiles (serial numbers), or queue failed ones again')
+    add.add_argument('profiles', nargs='+')
+    add.add_argument('--priority', type=int, default=0)
+    add.add_argument('--no-resolve', action='store_true',
+                     help='queue the serial numbers without looking them up in AdsPower (coordinator mode)')
+    cancel = commands.add_parser('cancel', help='drop queued profiles')
+    cancel.add_argument('profiles', nargs='+')
+    priority = commands.add_parser('priority', help='change the priority of profiles; higher runs first')
+    priority.add_argument('priority', type=int)
+    priority.add_argument('profiles', nargs='+')
+    commands.add_parser('list', help='show the jobs of the current run key')
+    commands.add_parser('new-run', help='start a new run on the next start instead of going on with the current one')
+    args = parser.parse_args(argv)
+
+    if args.command == 'add':
+        if args.no_resolve:
+            profiles = [{'integer_id': i, 'alphanumeric_id': ''} for i in args.profiles]
+        else:
+            profiles = resolve_profiles(args.profiles)
+        print(f'{jobs.add(profiles, args.priority)} job(s) queued')
+    elif args.command == 'cancel':
+        print(f'{jobs.cancel(args.profiles)} job(s) cancelled')
+    elif args.command == 'priority':
+        print(f'{jobs.set_priority(args.profiles, args.priority)} job(s) updated')
+    elif args.command == 'new-run':
+        if CONFIG.get('PROGRESS_KEY'):
+            print('PROGRESS_KEY is set in .env, remove it to switch runs')
+            sys.exit(1)
+        print(f'Run {jobs.run_key} left with {jobs.counts()}, the next start begins run {progress.new_run()}')
+    else:
+        for profile_id, state, job_priority, leases, worker, result in jobs.jobs():
+            print(f'{profile_id:>8} {state:10} priority={job_priority} leases={leases} {worker or ""} {result or ""}'.rstrip())
+        print(jobs.counts())
+
+class Coordinator:
+    """Hands out the jobs of one run to `BOT worker` processes over HTTP (coordinator mode).
+
+    The coordinator owns jobs.db, progress.db and the report: workers lease profiles,
+    record task progress and send each profile's report row and spans back here, so
+    results, checkpoints and step metrics end up in one place; browser teardown spans, which
+    a worker records after the profile's row, follow with its heartbeats. Workers resolve profiles
+    with their own AdsPower; a worker that does not have a profile rejects it. A profile
+    rejected by every live worker is reported as not found once `expected_workers` have
+    registered, or, when that count is not set, once nothing else is left to run. Every
+    request must carry the shared COORDINATOR_TOKEN.
+    """
+    TOKEN_HEADER = 'X-Coordinator-Token'
+
+    def __init__(self, queue:JobQueue, progress:ProgressStore, report_writer:ReportWriter, token:str, expected_workers:int=0):
+        self.queue = queue
+        self.progress = progress
+        self.report_writer = report_writer
+        self.token = token
+        self.expected_workers = expected_workers
+        self.workers = {}  # worker -> {'seen': time, 'round_trips': count, 'released': bool}
+        self.lock = threading.Lock()
+
+    def seen(self, worker:str, round_trips:int=None):
+        with self.lock:
+            state = self.workers.setdefault(worker, {'seen': 0, 'round_trips': 0, 'released': False})
+            state['seen'] = time.time()
+            if round_trips is not None:
+                state['round_trips'] = round_trips
+
+    def live_workers(self)->set:
+        cutoff = time.time() - self.queue.lease_seconds
+        with self.lock:
+            return {worker for worker, state in self.workers.items() if state['seen'] >= cutoff}
+
+    def finish_rejected(self):
+        # a worker that has not registered yet may still have the profile
+        with self.lock:
+            registered = len(self.workers)
+        if registered < self.expected_workers:
+            return
+        for profile_id in self.queue.finish_rejected(self.live_workers(), drained_only=not self.expected_workers):
+            logger.error(f'Profile {profile_id} not found in the AdsPower of any worker')
+            self.report_writer.write({'Profile ID': profile_id, 'Result': 'Profile not found in AdsPower'})
+
+    def finished(self)->bool:
+        # every live worker has released its leases, so its teardown spans are in
+        live = self.live_workers()
+        with self.lock:
+            return all(self.workers[worker]['released'] for worker in live)
+
+    def round_trips(self)->int:
+        with self.lock:
+            return sum(state['round_trips'] for state in self.workers.values())
+
+    def drained(self)->bool:
+        counts = self.queue.counts()
+        return not counts.get('queued') and not counts.get('leased')
+
+    def handle(self, path:str, request:dict)->dict:
+        worker = request.get('worker')
+        if worker:
+            self.seen(worker, request.get('round_trips'))
+        for profile_id, span in request.get('spans', []):
+            spans.merge(profile_id, [span])
+        if path == '/register':
+            return {'run_key': self.queue.run_key, 'lease_seconds': self.queue.lease_seconds}
+        if path == '/lease':
+            return {'job': self.queue.lease(worker), 'drained': self.drained()}
+        if path == '/heartbeat':
+            self.queue.heartbeat(worker)
+            return {}
+        if path == '/complete':
+            row = request['row']
+            self.queue.complete(request['profile_id'], row, worker)
+            spans.merge(request['profile_id'], row.get('Steps', []))
+            self.report_writer.write(row)
+            return {}
+        if path == '/reject':
+            self.queue.reject(request['profile_id'], worker)
+            return {}
+        if path == '/release':
+            with self.lock:
+                self.workers[worker]['released'] = True
+            return {'released': self.queue.release(worker)}
+        if path == '/progress/done':
+            return {'runs': self.progress.done(request['profile_id'], request['task'])}
+        if path == '/progress/record':
+            self.progress.record(request['profile_id'], request['task'])
+            return {}
+        return None
+
+    def authorized(self, token:str)->bool:
+        return hmac.compare_digest((token or '').encode(), self.token.encode())
+
+    def serve(self, port:int, bind:str='127.0.0.1')->ThreadingHTTPServer:
+        coordinator = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                if not coordinator.authorized(self.headers.get(Coordinator.TOKEN_HEADER)):
+                    logger.warning(f'Rejected {self.path} from {self.client_address[0]}: bad or missing token')
+                    self.send_error(403)
+                    return
+                try:
+                    request = json.loads(self.rfile.read(int(self.headers.get('Content-Length') or 0)) or b'{}')
+                    response = coordinator.handle(self.path, request)
+                except:
+                    logger.exception(f'Error handling {self.path}')
+                    self.send_error(500)
+                    return
+                if response is None:
+                    self.send_error(404)
+                    return
+                body = json.dumps(response).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((bind, port), Handler)
+        threading.Thread(target=server.serve_forever, name='coordinator', daemon=True).start()
+        return server
+
+class RemoteCoordinator:
+    # one worker process's connection to `BOT coordinator`
+    def __init__(self, url:str, token:str, retries:int=5, retry_interval:float=2):
+        self.url = url.rstrip('/')
+        self.headers = {Coordinator.TOKEN_HEADER: token}
+        self.retries = retries
+        self.retry_interval = retry_interval
+        self.worker = f'{socket.gethostname()}-{os.getpid()}'
+
+    def call(self, path:str, **request)->dict:
+        for attempt in range(self.retries):
+            try:
+                response = requests.post(f'{self.url}{path}', json={'worker': self.worker, **request},
+                                         headers=self.headers, timeout=30)
+                response.raise_for_status()
+                return response.json()
+            except requests.exceptions.RequestException as e:
+                # a wrong token does not get better with retries
+                if attempt == self.retries - 1 or getattr(e.response, 'status_code', None) == 403:
+                    raise
+                logger.warning(f'Coordinator request {path} failed, retrying')
+                time.sleep(self.retry_interval)
+
+class RemoteJobQueue:
+    """JobQueue interface of a worker process; leases come from the coordinator."""
+    def __init__(self, coordinator:RemoteCoordinator):
+        self.coordinator = coordinator
+        registration = coordinator.call('/register')
+        self.run_key = registration['run_key']
+        self.lease_seconds = registration['lease_seconds']
+
+    def next(self, stopped:threading.Event, poll_interval:float=2)->dict:
+        while not stopped.is_set():
+            try:
+                response = self.coordinator.call('/lease')
+            except requests.exceptions.RequestException:
+                logger.error('Coordinator unreachable, stopping')
+                return None
+            job = response['job']
+            if job is not None:
+                # the coordinator only knows serial numbers; this worker's AdsPower has the user_ids
+                profiles = resolve_profiles([job['integer_id']])
+                if profiles:
+                    return profiles[0]
+                # another worker's AdsPower may have this profile
+                try:
+                    self.coordinator.call('/reject', profile_id=job['integer_id'])
+                except requests.exceptions.RequestException:
+                    logger.error('Coordinator unreachable, stopping')
+                    return None
+                continue
+            if response['drained']:
+                return None
+            stopped.wait(poll_interval)
+        return None
+
+    def heartbeat(self):
+        self.coordinator.call('/heartbeat', round_trips=spans.round_trips, spans=spans.pop_detached())
+
+    def complete(self, profile_id:str, row:dict):
+        self.coordinator.call('/complete', profile_id=profile_id, row=row, round_trips=spans.round_trips)
+
+    def release(self)->int:
+        return self.coordinator.call('/release', round_trips=spans.round_trips, spans=spans.pop_detached())['released']
+
+class RemoteProgressStore:
+    """ProgressStore interface of a worker process; checkpoints live on the coordinator."""
+    def __init__(self, coordinator:RemoteCoordinator, run_key:str):
+        self.coordinator = coordinator
+        self.run_key = run_key
+
+    def done(self, profile_id:str, task:str)->int:
+        return self.coordinator.call('/progress/done', profile_id=profile_id, task=task)['runs']
+
+    def record(self, profile_id:str, task:str):
+        self.coordinator.call('/progress/record', profile_id=profile_id, task=task)
+
+def coordinator_command(argv:list):
+    """`BOT coordinator [--port N]`: serve profiles.csv to `BOT worker` processes until every job is done."""
+    import argparse
+    parser = argparse.ArgumentParser(prog='BOT coordinator')
+    parser.add_argument('--port', type=int, default=int(CONFIG.get('COORDINATOR_PORT') or 8700))
+    parser.add_argument('--bind', default=CONFIG.get('COORDINATOR_BIND') or '127.0.0.1',
+                        help='address to listen on; 0.0.0.0 to accept workers on other hosts')
+    parser.add_argument('--workers', type=int, default=int(CONFIG.get('COORDINATOR_WORKERS') or 0),
+                        help='number of workers taking part; profiles no worker has are reported once all of them registered')
+    parser.add_argument('--linger', type=float, default=120,
+                        help='seconds to wait, once all jobs are done, for workers to close their browsers and release')
+    args = parser.parse_args(argv)
+    token = CONFIG.get('COORDINATOR_TOKEN')
+    if not token:
+        logger.error('Set COORDINATOR_TOKEN in .env, workers send it with every request')
+        sys.exit(1)
+
+    Path(reports_dir).mkdir(parents=True, exist_ok=True)
+    timestamp = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
+    # workers resolve profiles against their own AdsPower, so only serial numbers are queued here
+    start_run()
+    queued = jobs.add([{'integer_id': i, 'alphanumeric_id': ''} for i in read_profile_ids()])
+    logger.info(f'{queued} profile(s) queued, jobs: {jobs.counts()}')
+    spans.open(os.path.join(reports_dir, f'spans_{timestamp}.jsonl'))
+    report_writer = ReportWriter(os.path.join(reports_dir, f'report_{timestamp}.csv'))
+    report_writer.start()
+    coordinator = Coordinator(jobs, progress, report_writer, token, args.workers)
+    server = coordinator.serve(args.port, args.bind)
+    logger.info(f'Coordinator listening on {args.bind}:{server.server_port}')
+    try:
+        while not coordinator.drained():
+            time.sleep(2)
+            coordinator.finish_rejected()
+        logger.info(f'All jobs done: {jobs.counts()}')
+        # workers polling for a lease learn that the run is over, then send their teardown spans
+        lingering = time.monotonic() + args.linger
+        while not coordinator.finished() and time.monotonic() < lingering:
+            time.sleep(1)
+    finally:
+        server.shutdown()
+        report_writer.close()
+        spans.add_round_trips(coordinator.round_trips())
+        spans.write_prometheus(os.path.join(reports_dir, f'spans_{timestamp}.prom'))
+        spans.close()
+        profile_logs.stop()
+    print("Report has been generated.")
+
+class Prelauncher:
+    """Launches and warms up browsers for the next profiles while workers run tasks.
 
+    At most `lookahead` launched browsers wait for a worker, so a worker that finishes a
+    profile picks up a ready browser instead of waiting for AdsPower and the warm-up.
+    """
+    def __init__(self, next_profile, lookahead:int):
+        self.next_profile = next_profile  # blocks for the next profile, None when there are no more
+        self.slots = threading.Semaphore(lookahead)
+        self.ready = queue.Queue()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, name='prelauncher', daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def _run(self):
+        try:
+            while True:
+                self.slots.acquire()
+                profile = None if self.stopped.is_set() else self.next_profile()
+                if profile is None:
+                    break
+                custom_logger = start_profile_logger(profile)
+                if get_wallets().get(int(profile["integer_id"])) is None or not remaining_work(profile):
+                    # main() reports the missing wallet or finished profile, no point launching a browser for it
+                    launched = None
+                else:
+                    try:
+                        launched = launch_profile(profile, custom_logger)
+                    except Exception as e:
+                        custom_logger.exception('Exception when launching profile')
+                        launched = str(e)
+                if self.stopped.is_set():
+                    close_browser_profile(profile['alphanumeric_id'], launched, custom_logger, profile['integer_id'])
+                    break
+                self.ready.put((profile, custom_logger, launched))
+        finally:
+            self.ready.put(None)
+
+    def next(self):
+        """Next (profile, logger, driver or failure) ready to run, or None when all profiles are handed out."""
+        started = time.monotonic()
+        item = self.ready.get()
+        if item is not None:
+            self.slots.release()
+            item[1].debug(f'Worker waited {time.monotonic() - started:.1f}s for the prelaunched browser')
+        return item
+
+    def close(self):
+        # Stop launching and tear down browsers nobody picked up
+        self.stopped.set()
+        self.slots.release()
+        while True:
+            try:
+                item = self.ready.get_nowait()
+            except queue.Empty:
+                return
+            if item is not None:
+                profile, custom_logger, launched = item
+                close_browser_profile(profile['alphanumeric_id'], launched, custom_logger, profile['integer_id'])
+
+class ConcurrencyController:
+    """Caps how many profiles run at once and moves the cap between `floor` and `ceiling`.
+
+    Every `interval` seconds the cap drops by a quarter when free memory, CPU load, the
+    AdsPower error rate or step latency look unhealthy, and grows by one when all of them
+    have headroom and every slot is busy. Each decision is logged with the signals behind it.
+    """
+    def __init__(self, floor:int, ceiling:int, start:int, interval:float=30):
+        self.floor = floor
+        self.ceiling = ceiling
+        self.limit = min(max(start, floor), ceiling)
+        self.interval = interval
+        self.active = 0
+        self.condition = threading.Condition()
+        self.stopped = threading.Event()
+        self.thread = None
+        self.last_api = adspower_pool.metrics()
+        self.min_free_memory = float(CONFIG.get('MIN_FREE_MEMORY_MB') or 2048)
+        self.profile_memory = float(CONFIG.get('PROFILE_MEMORY_MB') or 800)
+        self.max_cpu = float(CONFIG.get('MAX_CPU_PERCENT') or 85)
+        self.max_api_error_rate = float(CONFIG.get('MAX_API_ERROR_RATE') or 0.2)
+        self.max_latency_inflation = float(CONFIG.get('MAX_STEP_LATENCY_INFLATION') or 2)
+        if psutil is not None:
+            # the first cpu_percent() call has nothing to compare against and returns 0.0
+            psutil.cpu_percent()
+
+    def acquire(self):
+        with self.condition:
+            while self.active >= self.limit:
+                self.condition.wait()
+            self.active += 1
+
+    def release(self):
+        with self.condition:
+            self.active -= 1
+            self.condition.notify_all()
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name='concurrency-controller', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                self.adjust()
+            except:
+                logger.exception('Error adjusting concurrency')
+
+    def signals(self)->dict:
+        signals = {'free_memory_mb': None, 'cpu_percent': None}
+        if psutil is not None:
+            signals['free_memory_mb'] = psutil.virtual_memory().available / 2**20
+            signals['cpu_percent'] = psutil.cpu_percent()
+        api = adspower_pool.metrics()
+        requests_made = api['requests'] - self.last_api['requests']
+        failures = api['errors'] + api['throttled'] - self.last_api['errors'] - self.last_api['throttled']
+        signals['api_error_rate'] = failures / requests_made if requests_made else 0
+        self.last_api = api
+        signals['latency_inflation'] = step_latency.inflation()
+        return signals
+
+    def adjust(self):
+        signals = self.signals()
+        free_memory, cpu = signals['free_memory_mb'], signals['cpu_percent']
+        reasons = []
+        if free_memory is not None and free_memory < self.min_free_memory:
+            reasons.append(f'free memory {free_memory:.0f}MB < {self.min_free_memory:.0f}MB')
+        if cpu is not None and cpu > self.max_cpu:
+            reasons.append(f'cpu {cpu:.0f}% > {self.max_cpu:.0f}%')
+        if signals['api_error_rate'] > self.max_api_error_rate:
+            reasons.append(f'AdsPower error rate {signals["api_error_rate"]:.0%}')
+        if signals['latency_inflation'] > self.max_latency_inflation:
+            reasons.append(f'step latency x{signals["latency_inflation"]:.1f}')
+
+        with self.condition:
+            old_limit = self.limit
+            if reasons:
+                self.limit = max(self.floor, min(self.limit - 1, int(self.limit * 0.75)))
+                decision = 'down: ' + ', '.join(reasons)
+            elif self.active < self.limit:
+                decision = 'hold: free slots'
+            elif free_memory is not None and free_memory - self.profile_memory < self.min_free_memory:
+                decision = 'hold: no memory for another profile'
+            elif cpu is not None and cpu > self.max_cpu * 0.8:
+                decision = 'hold: cpu near limit'
+            else:
+                self.limit = min(self.ceiling, self.limit + 1)
+                decision = 'up: all signals healthy'
+            self.condition.notify_all()
+
+        logger.info(f'Concurrency {old_limit} -> {self.limit} ({decision}) '
+                    f'[active={self.active}, free_memory_mb={"n/a" if free_memory is None else round(free_memory)}, '
+                    f'cpu={"n/a" if cpu is None else round(cpu)}, api_error_rate={signals["api_error_rate"]:.2f}, '
+                    f'latency_inflation={signals["latency_inflation"]:.2f}]')
 
 def delete_old_logs():
     for filename in os.listdir(logs_dir):
@@ -1562,6 +3178,15 @@ def delete_old_logs():
             os.remove(file_path)
 
 if __name__ == '__main__':
+    if sys.argv[1:2] == ['jobs']:
+        jobs_command(sys.argv[2:])
+        sys.exit(0)
+    if sys.argv[1:2] == ['coordinator']:
+        coordinator_command(sys.argv[2:])
+        sys.exit(0)
+    # `BOT worker <coordinator url>` runs profiles leased from a coordinator instead of profiles.csv
+    coordinator_url = sys.argv[2] if sys.argv[1:2] == ['worker'] and len(sys.argv) > 2 else None
+
     # create essential directories
     Path(logs_dir).mkdir(parents=True, exist_ok=True)
     Path(reports_dir).mkdir(parents=True, exist_ok=True)
@@ -1583,21 +3208,101 @@ if __name__ == '__main__':
         sys.exit(1)
 
     logger.debug('Started')
-    profiles = get_profiles()
-    report = []
-
-    with ThreadPoolExecutor(max_workers=5) as executor:
-        futures = {executor.submit(run_profile, profile): profile for profile in profiles}
-        
-        for future in as_completed(futures):
-            report.append(future.result())
-
-    
-    with open(file_path, mode='w', newline='') as file:
-        fieldnames = ['Profile ID', 'Result']
-        writer = csv.DictWriter(file, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(report)
-
+    try:
+        get_wallets()
+    except:
+        logger.exception('Error loading Particle wallets.xlsx')
+        sys.exit(1)
+    if coordinator_url:
+        if not CONFIG.get('COORDINATOR_TOKEN'):
+            logger.error("Set COORDINATOR_TOKEN in .env to the coordinator's token")
+            sys.exit(1)
+        try:
+            remote = RemoteCoordinator(coordinator_url, CONFIG['COORDINATOR_TOKEN'])
+            jobs = RemoteJobQueue(remote)
+        except requests.exceptions.RequestException:
+            logger.exception(f'Coordinator {coordinator_url} unreachable')
+            sys.exit(1)
+        progress = RemoteProgressStore(remote, jobs.run_key)
+        spans.forward_detached()
+        logger.info(f'Working for coordinator {coordinator_url} as {remote.worker}')
+    else:
+        start_run()
+        queued = jobs.add(get_profiles())
+        logger.info(f'{queued} profile(s) queued, jobs: {jobs.counts()}')
+    spans.open(os.path.join(reports_dir, f'spans_{timestamp}.jsonl'))
+    report_writer = ReportWriter(file_path)
+    report_writer.start()
+
+    def report_result(profile, future):
+        try:
+            row = future.result()
+        except Exception as e:
+            logger.exception('Profile run crashed')
+            row = {"Profile ID": profile['integer_id'], "Result": str(e)}
+        # the local report keeps the row even when the coordinator cannot be reached
+        report_writer.write(row)
+        try:
+            jobs.complete(profile['integer_id'], row)
+        except requests.exceptions.RequestException:
+            logger.error(f"Coordinator unreachable, profile {profile['integer_id']} not marked done; its lease will expire")
+
+    controller = ConcurrencyController(
+        floor=int(CONFIG.get('MIN_WORKERS') or 1),
+        ceiling=int(CONFIG.get('MAX_WORKERS') or 10),
+        start=int(CONFIG.get('START_WORKERS') or 5),
+    )
+    controller.start()
+    heartbeat = JobHeartbeat(jobs)
+    heartbeat.start()
+    dispatch_stopped = threading.Event()
+    next_job = lambda: jobs.next(dispatch_stopped)
+    lookahead = int(CONFIG.get('PRELAUNCH_LOOKAHEAD') or 1)
+    prelauncher = Prelauncher(next_job, lookahead) if lookahead > 0 else None
+    if prelauncher:
+        prelauncher.start()
+    try:
+        with ThreadPoolExecutor(max_workers=controller.ceiling) as executor:
+            try:
+                while True:
+                    # take a worker slot first so prelaunched browsers are not held while no worker is free
+                    controller.acquire()
+                    if prelauncher:
+                        args = prelauncher.next()
+                    else:
+                        profile = next_job()
+                        args = (profile,) if profile else None
+                    if args is None:
+                        controller.release()
+                        break
+                    future = executor.submit(run_profile, *args)
+                    future.add_done_callback(lambda _: controller.release())
+                    future.add_done_callback(functools.partial(report_result, args[0]))
+            finally:
+                dispatch_stopped.set()
+                if prelauncher:
+                    prelauncher.close()
+    finally:
+        # rows are already on disk; this only flushes the tail and stops the writer thread
+        controller.stop()
+        report_writer.close()
+        # teardown spans go to the coordinator with the release
+        stragglers = browser_teardown.shutdown()
+        if stragglers:
+            logger.error(f'{len(stragglers)} browsers did not close: {", ".join(stragglers)}')
+        heartbeat.stop()
+        released = jobs.release()
+        if released:
+            logger.info(f'{released} unstarted job(s) returned to the queue')
+
+    spans.write_prometheus(os.path.join(reports_dir, f'spans_{timestamp}.prom'), adspower_pool.prometheus_lines())
+    spans.close()
+
+    log_step_savings()
+    logger.info(f'AdsPower API: {adspower_pool.metrics()}')
+    if len(adspower_pool.backends) > 1:
+        for name, metrics in adspower_pool.backend_metrics().items():
+            logger.info(f'AdsPower {name}: {metrics}')
+    profile_logs.stop()
     print("Report has been generated.")
 
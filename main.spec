@@ -10,7 +10,8 @@ a = Analysis(
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    # main.py never imports these; openpyxl would otherwise pull numpy in
+    excludes=['pandas', 'numpy', 'pyperclip', 'tkinter', 'matplotlib', 'PIL', 'IPython', 'lib2to3', 'test'],
     noarchive=False,
     
 )
@@ -25,7 +26,8 @@ exe = EXE(
     debug=False,
     bootloader_ignore_signals=False,
     strip=False,
-    upx=True,
+    # UPX-packed binaries and DLLs are unpacked again on every start
+    upx=False,
     console=True,
     disable_windowed_traceback=False,
     argv_emulation=False,
@@ -39,7 +41,7 @@ coll = COLLECT(
     a.binaries,
     a.datas,
     strip=False,
-    upx=True,
+    upx=False,
     upx_exclude=[],
     name='main',
 )